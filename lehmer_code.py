@@ -8,6 +8,7 @@ Based on Ben Botto Blog post
 https://medium.com/@benjamin.botto/implementing-an-optimal-rubiks-cube-solver-using-korf-s-algorithm-bf750b332cf9
 See that for inspiration
 """
+import math
 import numpy as np
 
 class lehmer_code():
@@ -31,13 +32,13 @@ class lehmer_code():
             self.useFacts = np.zeros((n,), dtype=np.uint32)
             # factorial in reverse order
             for i in range(n):
-                self.useFacts[i] = np.math.factorial(n-i-1)
+                self.useFacts[i] = math.factorial(n-i-1)
                 #print(i, self.useFacts[i])
         else:
             self.useFacts = np.zeros((k,), dtype=np.uint32)
             # n choose k in reverse order
             for i in range(k):
-                self.useFacts[i] = np.math.factorial(n-i-1) / np.math.factorial(n-k)
+                self.useFacts[i] = math.factorial(n-i-1) // math.factorial(n-k)
                 #print(i, self.useFacts[i])
         # Build count seen lookup dictionary
         lrgInt = np.power(2, n)
@@ -66,6 +67,33 @@ class lehmer_code():
             #    saveseen = lehmer[i]
 
         return np.sum(lehmer*self.useFacts)
+
+    # Same as encode for every row of p at once
+    # p - (N, k) array of the items picked (each row distinct values 0..n-1)
+    # OUTPUT int64 rank of each row
+    def encode_batch(self, p):
+        p = np.asarray(p, dtype=np.int64)
+        ranks = np.zeros((p.shape[0],), dtype=np.int64)
+        seen = np.zeros((p.shape[0],), dtype=np.int64)
+        for i in range(self.k):
+            seen = seen | (1 << (self.n - p[:, i] - 1))
+            numOnes = self.countbits[seen >> (self.n - p[:, i])]
+            ranks = ranks + (p[:, i] - numOnes) * np.int64(self.useFacts[i])
+        return ranks
+
+    # Inverse of encode_batch
+    # ranks - (N,) array of ranks
+    # OUTPUT (N, k) int64 array of the items picked
+    def decode_batch(self, ranks):
+        ranks = np.asarray(ranks, dtype=np.int64)
+        p = np.zeros((ranks.shape[0], self.k), dtype=np.int64)
+        for i in range(self.k):
+            p[:, i] = (ranks // np.int64(self.useFacts[i])) % (self.n - i)
+        # Turn the digits into items from the right. Each later item
+        #  skips over the ones picked before it
+        for i in range(self.k - 2, -1, -1):
+            p[:, i+1:] = p[:, i+1:] + (p[:, i+1:] >= p[:, i:i+1])
+        return p
         
 if __name__ == '__main__':
     
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+Fast generator for the pattern databases.
+  Replaces rubik_cube_cython_cornerdbgen.py,
+  rubik_cube_cython_alledgenofacedbgen.py and
+  rubik_cube_cython_edge1dbgen_12p7_DFS.py. Instead of keeping a deque of
+  cube configurations the search runs level by level over the index
+  space of the database (bfs_level in rubik_cython_dbgen.pyx). Every
+  entry at the current depth is unranked, moved with small per move
+  tables and the children are ranked again. The only memory is the table
+  itself at one byte per entry (~0.5GB for the largest databases). With
+  DISKTABLE = True the table is a memory mapped file on disk instead.
+  The per move tables are made here from the facelet geometry of
+  rubik_cube_symmetry.py. A face turn rotates the facelets of one layer
+  by a quarter, half or three quarter turn. The order of the 18 moves does
+  not matter for the distances.
+  The databases are indexed by the same lehmer codes as the solver
+  (corner_p_idx, edge_p_idx, edge1_p_idx and edge2_p_idx in
+  lehmer_code_faces of rubik_cython_roll_buffdq_solve_MP.pyx) and saved as
+  int8 npz files with the name and layout of the downloaded ones. The
+  search runs to the end so the all edge and 12p7 edge databases are
+  exact. The old generators stopped at depth 9 and put 10 in the entries
+  they did not reach.
+  With USENCPUS above 1 the table is a shared RawArray and every level is
+  split into slices of the index space that a pool of workers expand at
+  the same time. The parent waits for all the slices of a level before
+  it starts the next one. The workers are forked so they see the table
+  and the move tables through dbgen_Storage like the solver workers see
+  the pattern databases.
+  A database is described by a spec in db_specs: which corner and edge
+  faces it tracks and whether it keeps their orientation. The index is
+  the rank of the corners times the number of edge ranks plus the rank of
+  the edges. Specs other than the solver ones are saved as
+  rubik_<name>_db.npz. The spec and the size are saved in the npz next to
+  the table.
+  After a level, once CHECKPOINT_SECS have passed since the last
+  checkpoint, the partial table is streamed to a checkpoint file (a
+  nibble packed chunked .pdbz file, see rubik_pattern_db.py). Running the
+  routine again resumes from it. The checkpoint is removed once the
+  database is saved.
+python rubik_cube_fast_dbgen.py [name in db_specs] [outfile]
+"""
+import os
+import sys
+from multiprocessing import RawArray, cpu_count, get_context
+from timeit import default_timer as timer
+import numpy as np
+import rubik_pattern_db as pdb
+import rubik_cube_symmetry as rcs
+import rubik_cython_dbgen as rdg
+import lehmer_code as lc
+
+# The faces used for the edge lehmer codes (edge_p_idx, edge1_p_idx and
+#  edge2_p_idx in the cython)
+edge_faces = np.array([43,41,45,47,25,13,29,9,35,37,33,39])
+edge1_faces = np.array([43,45,25,29,35,33,41])
+edge2_faces = np.array([41,47,13,9,37,39,43])
+# The cubies of each database. The faces whose cubies are tracked in the
+#  order they are ranked in and the number of orientations kept for them
+#  (3 for corners, 2 for edges or 1 to ignore the orientation). The
+#  first four are the databases of the solver. Add a spec here to make a
+#  database for any other set of cubies, e.g. the two below
+db_specs = {'corner':{'corner_faces':rcs.corner_faces, 'corner_nori':3, \
+                      'edge_faces':[], 'edge_nori':1},\
+            'alledge':{'corner_faces':[], 'corner_nori':1, \
+                       'edge_faces':edge_faces, 'edge_nori':1},\
+            'edge1':{'corner_faces':[], 'corner_nori':1, \
+                     'edge_faces':edge1_faces, 'edge_nori':2},\
+            'edge2':{'corner_faces':[], 'corner_nori':1, \
+                     'edge_faces':edge2_faces, 'edge_nori':2},\
+            'edge6':{'corner_faces':[], 'corner_nori':1, \
+                     'edge_faces':[43,45,25,29,35,33], 'edge_nori':2},\
+            'corner4edge2':{'corner_faces':[42,44,40,46], 'corner_nori':3, \
+                            'edge_faces':[43,45], 'edge_nori':2}}
+# Switch from pushing the frontier to pulling into the unvisited entries
+#  once there are fewer unvisited entries than this times the frontier.
+#  A pull stops at the first child found at the current depth
+PULL_RATIO = 2
+# Slices of the index space per worker for each level. More slices than
+#  workers evens out the slices where the current depth is dense
+SLICES_PER_CPU = 16
+# Seconds between checkpoints. They are only written between levels
+CHECKPOINT_SECS = 600
+# Value of the entries not reached yet in a checkpoint file. The largest
+#  other value is the last depth that was finished
+CKPT_UNVISITED = 15
+
+# The shared table and the groups with their move tables for the workers
+#  [db, groups]. Set before the pool is forked
+dbgen_Storage = []
+
+# The facelet permutations of the 18 face turns
+# OUTPUT move_dst[m, p] position facelet p moves to under move m
+def move_facelet_perms():
+    geo = {}
+    for names, ids in zip(rcs.corner_list_names + rcs.edge_list_names, \
+                          rcs.corner_list_ids + rcs.edge_list_ids):
+        for nm, p in zip(names, ids):
+            pos, normal = rcs.facelet_geometry(nm)
+            geo[p] = (pos, normal)
+    move_dst = np.zeros((18, 48), dtype=np.uint8)
+    m = 0
+    for axis in range(3):
+        # Quarter turn about axis
+        rot = np.zeros((3,3), dtype=int)
+        a, b = [x for x in range(3) if not x == axis]
+        rot[axis, axis] = 1
+        rot[a, b] = -1
+        rot[b, a] = 1
+        for side in [-1, 1]:
+            for nturn in range(1, 4):
+                mat = np.linalg.matrix_power(rot, nturn)
+                for p, (pos, normal) in geo.items():
+                    if pos[axis] == side:
+                        newpos = tuple(mat.dot(pos))
+                        newnormal = tuple(mat.dot(normal))
+                        move_dst[m, p] = [q for q, (qpos, qnormal) in geo.items() \
+                                          if tuple(qpos) == newpos and \
+                                          tuple(qnormal) == newnormal][0]
+                    else:
+                        move_dst[m, p] = p
+                m = m + 1
+    return move_dst
+
+# Per move relabel tables of a database coordinate
+#  Move m takes the faceid of cubie c with orientation o to the faceid of
+#  the facelet its home facelet is moved to
+# OUTPUT newcubie, newori as used by bfs_level in rubik_cython_dbgen.pyx
+def relabel_tables(base, ncubie, nori, move_dst):
+    home = np.zeros((128,), dtype=int)
+    home[rcs.facecodeints] = np.arange(48)
+    newcubie = np.zeros((18, ncubie * nori), dtype=np.uint8)
+    newori = np.zeros((18, ncubie * nori), dtype=np.uint8)
+    for m in range(18):
+        for c in range(ncubie):
+            for o in range(nori):
+                newid = rcs.facecodeints[move_dst[m, home[((c + base) << 2) | o]]]
+                newcubie[m, c*nori + o] = (newid >> 2) - base
+                if nori > 1:
+                    newori[m, c*nori + o] = newid & 3
+    return newcubie, newori
+
+# Groups of the coordinate of a spec, corners first
+# OUTPUT list of (faces, faceid>>2 of the first cubie of the kind,
+#  number of cubies of the kind, number of orientations)
+def spec_groups(spec):
+    groups = []
+    if len(spec['corner_faces']) > 0:
+        groups.append((np.array(spec['corner_faces']), 0, 8, spec['corner_nori']))
+    if len(spec['edge_faces']) > 0:
+        groups.append((np.array(spec['edge_faces']), 8, 12, spec['edge_nori']))
+    return groups
+
+# Number of entries of the database of a spec
+def spec_size(spec):
+    n = 1
+    for faces, base, ncubie, nori in spec_groups(spec):
+        n = n * rdg.group_size(len(faces), ncubie, nori)
+    return n
+
+# Index of a cube in the database of a spec
+#  fc - faceid of each of the 48 faces
+def spec_index(spec, fc):
+    idx = 0
+    for faces, base, ncubie, nori in spec_groups(spec):
+        ids = np.asarray(fc)[faces]
+        idx = idx * rdg.group_size(len(faces), ncubie, nori) + \
+              rdg.rank((ids >> 2) - base, ids & 3, ncubie, nori)
+    return idx
+
+# Index of many cubes at once in the database of a spec
+#  fcs - (N, 48) faceids of the cubes
+def spec_index_batch(spec, fcs):
+    idx = np.zeros((fcs.shape[0],), dtype=np.int64)
+    for faces, base, ncubie, nori in spec_groups(spec):
+        ids = fcs[:, faces].astype(np.int64)
+        r = lc.lehmer_code(ncubie, len(faces)).encode_batch((ids >> 2) - base)
+        nodig = 0
+        if nori > 1:
+            nodig = len(faces) - 1 if len(faces) == ncubie else len(faces)
+        for i in range(nodig):
+            r = r * nori + (ids[:, i] & 3)
+        idx = idx * rdg.group_size(len(faces), ncubie, nori) + r
+    return idx
+
+# Spec and size saved next to the table so the database can be ranked
+#  without this routine
+def spec_metadata(spec):
+    return {'corner_faces':np.array(spec['corner_faces'], dtype=np.int32), \
+            'corner_nori':spec['corner_nori'], \
+            'edge_faces':np.array(spec['edge_faces'], dtype=np.int32), \
+            'edge_nori':spec['edge_nori'], 'size':spec_size(spec)}
+
+# Name of the checkpoint file for a database
+def ckpt_file(name):
+    return 'rubik_{0}_db_ckpt.pdbz'.format(name)
+
+# Name of the memory mapped table file for a database
+def table_file(name):
+    return 'rubik_{0}_db_table.bin'.format(name)
+
+# Stream the partial table to a checkpoint file a chunk at a time
+#  It is written to a temporary file first so a crash while writing
+#  leaves the previous checkpoint in place
+def save_checkpoint(filename, db):
+    chunks = ((len(db), np.minimum(db[i:i+pdb.CHUNK], CKPT_UNVISITED)) \
+              for i in range(0, len(db), pdb.CHUNK))
+    tmpfile = filename + '.tmp'
+    pdb.write_chunked_db(tmpfile, chunks, pdb.DB_NIBBLE, level=1)
+    os.replace(tmpfile, filename)
+
+# Fill the table db from a checkpoint file
+# OUTPUT the last depth that was finished
+def load_checkpoint(filename, db):
+    packed, n, fmt, maxval, layout = pdb.load_chunked_db(filename)
+    if not n == len(db):
+        raise ValueError('{0} has {1:d} entries not {2:d}'.format(filename, n, len(db)))
+    depth = 0
+    for i in range(0, n, pdb.CHUNK):
+        cur = pdb.unpack_nibbles(packed[i//2:], min(pdb.CHUNK, n - i))
+        reached = cur < CKPT_UNVISITED
+        if np.any(reached):
+            depth = max(depth, int(cur[reached].max()))
+        db[i:i+len(cur)] = np.where(reached, cur, rdg.UNVISITED)
+    return depth
+
+# Worker that expands one slice of a level
+def level_slice(inarr):
+    start, end, depth, pull = inarr
+    db, groups = dbgen_Storage
+    return rdg.bfs_level(db, depth, groups, pull, start, end)
+
+# Worker that counts the entries of a slice at a depth
+def count_slice(inarr):
+    start, end, depth = inarr
+    return rdg.count_value(dbgen_Storage[0], depth, start, end)
+
+# Run the breadth first search for one database
+# INPUT
+# name - database in db_specs
+# ncpus (optional) - number of worker processes
+# ckptfile (optional) - checkpoint file to resume from if it exists and
+#    to write checkpoints to
+# tablefile (optional) - keep the table in this memory mapped file
+# OUTPUT uint8 table of the distances
+def generate_db(name, ncpus=1, ckptfile=None, tablefile=None):
+    spec = db_specs[name]
+    move_dst = move_facelet_perms()
+    groups = []
+    for faces, base, ncubie, nori in spec_groups(spec):
+        newcubie, newori = relabel_tables(base, ncubie, nori, move_dst)
+        groups.append((len(faces), ncubie, nori, newcubie, newori))
+    n = spec_size(spec)
+    pmp = None
+    if tablefile is not None:
+        # Shared mapping so the forked workers write to the same pages
+        db = np.memmap(tablefile, dtype=np.uint8, mode='w+', shape=(n,))
+        db[:] = rdg.UNVISITED
+    elif ncpus > 1:
+        db = np.frombuffer(RawArray('B', n), dtype=np.uint8)
+        db[:] = rdg.UNVISITED
+    else:
+        db = np.full((n,), rdg.UNVISITED, dtype=np.uint8)
+    if ncpus > 1:
+        dbgen_Storage[:] = [db, groups]
+        pmp = get_context('fork').Pool(processes=ncpus)
+        nslice = ncpus * SLICES_PER_CPU
+        bounds = [n * i // nslice for i in range(nslice + 1)]
+    if ckptfile is not None and os.path.exists(ckptfile):
+        depth = load_checkpoint(ckptfile, db)
+        nfront = rdg.count_value(db, depth)
+        nleft = rdg.count_value(db, rdg.UNVISITED)
+        print('Resuming {0} from {1} after depth {2:d}'.format(name, ckptfile, depth))
+    else:
+        db[spec_index(spec, rcs.facecodeints)] = 0
+        depth = 0
+        nfront = 1
+        nleft = n - 1
+    lastckpt = timer()
+    while nfront > 0 and nleft > 0:
+        pull = 1 if nleft < nfront * PULL_RATIO else 0
+        startts = timer()
+        if pmp is None:
+            nfront = rdg.bfs_level(db, depth, groups, pull)
+        else:
+            # map returns once every slice of the level is done
+            nfront = sum(pmp.map(level_slice, [(bounds[i], bounds[i+1], depth, pull) \
+                                               for i in range(nslice)]))
+            if not pull:
+                # Slices pushing to the same child both counted it
+                nfront = sum(pmp.map(count_slice, [(bounds[i], bounds[i+1], depth+1) \
+                                                   for i in range(nslice)]))
+        nleft = nleft - nfront
+        depth = depth + 1
+        print('{0} depth {1:d} {2:d} entries {3} {4:.1f} s'.format(name, depth, \
+              nfront, 'pull' if pull else 'push', timer() - startts))
+        if ckptfile is not None and nfront > 0 and nleft > 0 and \
+                timer() - lastckpt >= CHECKPOINT_SECS:
+            save_checkpoint(ckptfile, db)
+            lastckpt = timer()
+            print('Wrote checkpoint {0}'.format(ckptfile))
+    if pmp is not None:
+        pmp.close()
+        pmp.join()
+        dbgen_Storage[:] = []
+    if nleft > 0:
+        print('{0:d} entries not reached'.format(nleft))
+    return db
+
+if __name__ == '__main__':
+    # Number of worker processes
+    USENCPUS = cpu_count()
+    # Keep the table in a file on disk instead of memory
+    DISKTABLE = False
+    usenames = ['corner', 'alledge', 'edge1', 'edge2']
+    if len(sys.argv) > 1:
+        usenames = [sys.argv[1]]
+    for curname in usenames:
+        if curname not in db_specs:
+            print('No spec for {0} in db_specs'.format(curname))
+            continue
+        outfile = pdb.spec_npz_file(curname)
+        if len(sys.argv) > 2:
+            outfile = sys.argv[2]
+        elif os.path.exists(outfile):
+            print('{0} exists, give an outfile to write the new {1} database'.format(outfile, curname))
+            continue
+        startts = timer()
+        usetable = table_file(curname) if DISKTABLE else None
+        db = generate_db(curname, USENCPUS, ckpt_file(curname), usetable)
+        print('{0} search took {1:.1f} s'.format(curname, timer() - startts))
+        np.savez_compressed(outfile, db=db.view(np.int8), **spec_metadata(db_specs[curname]))
+        print('Wrote {0}'.format(outfile))
+        for curfile in [ckpt_file(curname), usetable]:
+            if curfile is not None and os.path.exists(curfile):
+                os.remove(curfile)
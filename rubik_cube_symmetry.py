@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+Symmetries of the cube for the pattern databases.
+  The cube has 48 symmetries (24 rotations and their mirror images).
+  Conjugating a cube configuration by a symmetry (rotate/mirror the
+  cube, scramble, rotate/mirror back) gives a configuration that needs
+  the same number of moves to solve. The corner pattern database only needs
+  one entry for each such class of corner configurations.
+  The symmetries are built from the 3D facelet names used in
+  rubik_cython_roll_buffdq_solve_MP2.py. A facelet name like "03px" is
+  cubie 03 in the 3x3x3 grid (x fastest then y then z) with the face
+  pointing in the +x direction. Each symmetry is a signed permutation of
+  x, y, z and it moves a facelet position to another facelet position.
+  The symmetry reduced corner database keeps the corner permutation
+  only up to symmetry. For each of the 40320 corner permutations the class
+  (smallest conjugate permutation) and a symmetry that reaches it are
+  tabulated. The orientations come along for free by conjugating the 8
+  corner facelets that are used in the lehmer code.
+  Running this routine makes the symmetry reduced corner database from
+  the full one.
+python rubik_cube_symmetry.py
+"""
+import itertools
+import numpy as np
+import rubik_pattern_db as pdb
+import lehmer_code as lc
+
+# Facelet names and their positions in the 48 faceid array
+#  These are copied from the rubiks_cube class of
+#  rubik_cython_roll_buffdq_solve_MP2.py
+corner_list_names = [["01my","01mz","01mx"], ["03my","03px","03mz"],\
+                   ["07mx","07py","07mz"], ["09px","09py","09mz"],\
+                   ["19mx","19my","19pz"], ["21px","21my","21pz"],\
+                   ["25mx","25py","25pz"], ["27px","27py","27pz"]]
+edge_list_names = [["02my","02mz"], ["04mx","04mz"], ["06px","06mz"],\
+                 ["08py","08mz"], ["10mx","10my"], ["12px","12my"],\
+                 ["16mx","16py"], ["18px","18py"], ["20my","20pz"],\
+                 ["22mx","22pz"], ["24px","24pz"], ["26py","26pz"]]
+corner_list_ids = [[20, 42, 26], [18, 12, 44], [28, 2, 40], [10, 4, 46], [24, 22, 36], [14, 16, 34], [30, 0, 38], [8, 6, 32]]
+edge_list_ids = [[19, 43], [27, 41], [11, 45], [3, 47], [25, 21], [13, 17], [29, 1], [9, 5], [23, 35], [31, 37], [15, 33], [7, 39]]
+# faceids of the solved cube
+facecodeints = np.array([2, 49, 17, 65, 22, 53, 5, 33, \
+                6, 52, 21, 69, 26, 56, 9, 37, \
+                10, 57, 25, 73, 30, 61, 13, 41,\
+                14, 60, 29, 77, 18, 48, 1, 45,\
+                4, 36, 8, 40, 12, 44, 0, 32,\
+                16, 76, 28, 72, 24, 68, 20, 64])
+# The faces used for the corner lehmer code (corner_p_idx in the cython)
+corner_faces = np.array([42,44,40,46,36,34,38,32])
+NSYM = 48
+NCORNERPERM = 40320
+
+# Cubie coordinate (-1, 0, 1 for x, y, z) and face normal of a facelet name
+def facelet_geometry(name):
+    cubnum = int(name[0:2]) - 1
+    pos = np.array([cubnum % 3, (cubnum // 3) % 3, cubnum // 9]) - 1
+    normal = np.zeros((3,), dtype=int)
+    normal['xyz'.index(name[3])] = 1 if name[2] == 'p' else -1
+    return pos, normal
+
+# All 48 symmetries as 3x3 signed permutation matrices
+#  The identity is first
+def symmetry_matrices():
+    mats = []
+    for perm in itertools.permutations(range(3)):
+        for signs in itertools.product([1, -1], repeat=3):
+            m = np.zeros((3,3), dtype=int)
+            for i in range(3):
+                m[perm[i], i] = signs[i]
+            mats.append(m)
+    return mats
+
+# The facelet position permutations of the 48 symmetries
+# OUTPUT sym_dst[s, p] position facelet p moves to under symmetry s
+def symmetry_facelet_perms():
+    geo = {}
+    for names, ids in zip(corner_list_names + edge_list_names, \
+                          corner_list_ids + edge_list_ids):
+        for nm, p in zip(names, ids):
+            pos, normal = facelet_geometry(nm)
+            geo[(tuple(pos), tuple(normal))] = p
+    sym_dst = np.zeros((NSYM, 48), dtype=np.uint8)
+    for s, m in enumerate(symmetry_matrices()):
+        for (pos, normal), p in geo.items():
+            sym_dst[s, p] = geo[(tuple(m.dot(pos)), tuple(m.dot(normal)))]
+    return sym_dst
+
+# Tables for conjugating a cube configuration fc (faceids by position)
+#  by symmetry s:  fcsym[q] = sym_relabel[s, fc[sym_src[s, q]]]
+#  The facelet at p moves to the position of its symmetry image and the
+#  faceid it holds becomes the faceid of its home facelet's image
+# OUTPUT sym_src (48x48) and sym_relabel (48x128) uint8 tables
+def conjugation_tables():
+    sym_dst = symmetry_facelet_perms()
+    home = np.zeros((128,), dtype=int)
+    home[facecodeints] = np.arange(48)
+    sym_src = np.zeros((NSYM, 48), dtype=np.uint8)
+    sym_relabel = np.zeros((NSYM, 128), dtype=np.uint8)
+    for s in range(NSYM):
+        sym_src[s, sym_dst[s]] = np.arange(48)
+        sym_relabel[s, facecodeints] = facecodeints[sym_dst[s, home[facecodeints]]]
+    return sym_src, sym_relabel
+
+# Conjugate a cube configuration by symmetry s
+def conjugate(fc, s, sym_src, sym_relabel):
+    return sym_relabel[s][np.asarray(fc)[sym_src[s]]]
+
+# Symmetry classes of the corner permutations
+#  For each corner permutation rank find the smallest rank among its 48
+#  conjugates. That is the class representative.
+#  The permutation is the list of corner cubie ids at corner_faces.
+#  Symmetry s moves corner slot j (the corner of corner_faces[j]) to slot
+#  slot_perm[s, j] and the cubie that lives in slot j is relabeled to the
+#  cubie that lives in slot_perm[s, j]
+# OUTPUT
+#  perm_class - class number of each corner permutation rank
+#  perm_sym - a symmetry that conjugates the permutation to its
+#     class representative
+#  class_reps - permutation rank of each class representative
+def corner_perm_classes(sym_dst):
+    corner_slot = np.zeros((48,), dtype=int)
+    for k, ids in enumerate(corner_list_ids):
+        corner_slot[ids] = k
+    slot_of_face = corner_slot[corner_faces] # corner_list_ids slot -> j
+    j_of_slot = np.zeros((8,), dtype=int)
+    j_of_slot[slot_of_face] = np.arange(8)
+    solved_cids = facecodeints[corner_faces] >> 2
+    home_j = np.zeros((8,), dtype=int) # j where cubie id lives when solved
+    home_j[solved_cids] = np.arange(8)
+    corner_lc = lc.lehmer_code(8)
+    # The permutation of each rank (the cubie ids at corner_faces)
+    cids = corner_lc.decode_batch(np.arange(NCORNERPERM))
+    best_rank = np.full((NCORNERPERM,), NCORNERPERM, dtype=np.int64)
+    best_sym = np.zeros((NCORNERPERM,), dtype=np.uint8)
+    for s in range(NSYM):
+        slot_perm = j_of_slot[corner_slot[sym_dst[s, corner_faces]]]
+        conj = np.zeros_like(cids)
+        conj[:, slot_perm] = solved_cids[slot_perm[home_j[cids]]]
+        crank = corner_lc.encode_batch(conj)
+        better = crank < best_rank
+        best_rank[better] = crank[better]
+        best_sym[better] = s
+    class_reps, perm_class = np.unique(best_rank, return_inverse=True)
+    return perm_class.astype(np.int32), best_sym, class_reps
+
+# The 7 edge faces used for the edge1 lehmer code (edge1_p_idx in the cython)
+edge1_faces = np.array([43,45,25,29,35,33,41])
+
+# Symmetry for serving a second 7 edge heuristic from the edge1 database
+#  Looking up the cube conjugated by s in the edge1 database gives the
+#  distance for the edges in sym_src[s][edge1_faces] instead. Pick the
+#  symmetry whose edge set overlaps the edge1 edges the least so the two
+#  lookups are as independent as possible.
+#  The shipped edge2 set is not the image of the edge1 set under any
+#  symmetry (at best 6 of the 7 edges match) so this is a different set
+#  of edges than edge2
+# OUTPUT symmetry index, edge slots (edge_list_ids order) it covers
+def edge1_image_symmetry(sym_src):
+    edge_slot = np.full((48,), -1, dtype=int)
+    for k, ids in enumerate(edge_list_ids):
+        edge_slot[ids] = k
+    edge1_slots = set(edge_slot[edge1_faces])
+    overlaps = [len(set(edge_slot[sym_src[s][edge1_faces]]) & edge1_slots) \
+                for s in range(NSYM)]
+    s = int(np.argmin(overlaps))
+    return s, sorted(edge_slot[sym_src[s][edge1_faces]])
+
+# Everything set_corner_symmetry in rubik_cython_roll_buffdq_solve_MP.pyx
+#  needs
+# OUTPUT sym_src, sym_relabel, perm_class, perm_sym, class_reps
+def corner_symmetry_tables():
+    sym_src, sym_relabel = conjugation_tables()
+    perm_class, perm_sym, class_reps = corner_perm_classes(symmetry_facelet_perms())
+    return sym_src, sym_relabel, perm_class, perm_sym, class_reps
+
+# Make the symmetry reduced corner database from the full one
+#  Entry class*2187 + orientation is the full database entry of the class
+#  representative permutation with that orientation
+def make_sym_corner_db(cornerdb, class_reps):
+    symdb = cornerdb.reshape((NCORNERPERM, 2187))[class_reps]
+    return symdb.reshape((-1,))
+
+if __name__ == '__main__':
+    sym_src, sym_relabel, perm_class, perm_sym, class_reps = corner_symmetry_tables()
+    print('{0:d} corner permutation classes'.format(len(class_reps)))
+    cornerdb = pdb.load_npz_db(pdb.db_npz_files['corner'])
+    symdb = make_sym_corner_db(cornerdb, class_reps)
+    np.savez_compressed(pdb.db_npz_files['cornersym'], db=symdb)
+    print('Wrote {0} {1:d} entries'.format(pdb.db_npz_files['cornersym'], len(symdb)))
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+Breadth first search over the index space of a pattern database.
+  The state of the database is a coordinate: which cubie (and in what
+  orientation) sits in each of nslot fixed faces, out of ncubie cubies of
+  one kind. A coordinate can have a corner group and an edge group, e.g.
+  all 8 corners for the corner database, 7 of the 12 edges for the 12p7
+  edge databases or a few of each. An index is unranked into the slots,
+  the 18 moves are applied and the children are ranked again.
+  The ranking of a group is the same as lehmer_code_faces in
+  rubik_cython_roll_buffdq_solve_MP.pyx
+    rank = lehmer(cubies)*nori^k + orientation digits (most significant
+           first)
+  The lehmer digits of slot i have radix ncubie-i. When all the cubies are
+  in the group the orientation of the last slot follows from the
+  others (they always sum to 0 mod nori) and k = nslot-1, otherwise k = nslot.
+  With two groups index = rank of the first * size of the second + rank of
+  the second.
+  A move relabels the faceid in every slot (newcubie, newori tables of
+  each group per move for each cubie*nori+orientation). Turning the cube
+  moves cubies in from faces that are not in a partial coordinate like
+  12p7, so moving the slots is not defined there. Relabeling is, and going
+  out from the solved cube it reaches each index at the fewest moves of
+  any cube with that code, which is the value the databases hold.
+  The table is one uint8 per entry with UNVISITED for the entries not
+  reached yet. One call expands one level, either pushing from the entries
+  at the current depth or (once most of the table is reached) pulling
+  into the unvisited entries from any neighbor at the current depth.
+  A call can be limited to a slice of the index space so several
+  processes can expand the same level of a shared table at once. Two
+  processes pushing to the same child both write depth+1, so the table is
+  right but their counts can overlap. Use count_value for the exact count.
+  The tables come from rubik_cube_fast_dbgen.py which drives the search.
+python setup.py build_ext --inplace
+"""
+
+cimport cython
+from libc cimport stdint
+
+cdef extern from *:
+    int __builtin_popcount(unsigned int x) nogil
+
+# Table value of the entries not reached yet
+UNVISITED = 255
+cdef enum:
+    MAXSLOT = 12
+    MAXGROUP = 2
+    NMOVES = 18
+
+# One group of slots of a coordinate
+#  nodig - number of orientation digits in the rank
+#  size - number of ranks
+#  newcubie, newori - relabel tables, see coord_move
+cdef struct coord_group:
+    int nslot
+    int ncubie
+    int nori
+    int nodig
+    long long size
+    const stdint.uint8_t* newcubie
+    const stdint.uint8_t* newori
+
+# Rank the cubies (0..ncubie-1) in the slots of a group and their
+#  orientations
+cdef inline long long coord_rank(coord_group* g, stdint.uint8_t* p, \
+                                 stdint.uint8_t* o) nogil:
+    cdef unsigned int seen = 0
+    cdef long long r = 0
+    cdef int i
+    for i in range(g.nslot):
+        r = r * (g.ncubie - i) + p[i] - __builtin_popcount(seen & ((1u << p[i]) - 1))
+        seen = seen | (1u << p[i])
+    for i in range(g.nodig):
+        r = r * g.nori + o[i]
+    return r
+
+# Inverse of coord_rank
+@cython.cdivision(True)
+cdef inline int coord_unrank(coord_group* g, long long r, stdint.uint8_t* p, \
+                             stdint.uint8_t* o) nogil:
+    cdef int i, k, digit, tot
+    cdef unsigned int used = 0
+    tot = 0
+    for i in range(g.nodig - 1, -1, -1):
+        o[i] = r % g.nori
+        tot = tot + o[i]
+        r = r // g.nori
+    if g.nodig < g.nslot:
+        if g.nori > 1:
+            o[g.nslot - 1] = (g.nori - tot % g.nori) % g.nori
+        else:
+            for i in range(g.nslot):
+                o[i] = 0
+    # lehmer digits are stored in p first then turned into cubies
+    for i in range(g.nslot - 1, -1, -1):
+        p[i] = r % (g.ncubie - i)
+        r = r // (g.ncubie - i)
+    for i in range(g.nslot):
+        digit = p[i]
+        k = 0
+        while True:
+            if not (used >> k) & 1:
+                if digit == 0:
+                    break
+                digit = digit - 1
+            k = k + 1
+        p[i] = k
+        used = used | (1u << k)
+    return 0
+
+# Apply move m to the slots p, o of a group giving q, qo
+#  newcubie[m, c*nori + o], newori[m, c*nori + o] cubie and orientation
+#  that cubie c with orientation o is relabeled to. Passed flattened
+cdef inline int coord_move(coord_group* g, stdint.uint8_t* p, stdint.uint8_t* o, \
+                           stdint.uint8_t* q, stdint.uint8_t* qo, int m) nogil:
+    cdef int j, k
+    cdef int off = m * g.ncubie * g.nori
+    for j in range(g.nslot):
+        k = off + p[j] * g.nori + o[j]
+        q[j] = g.newcubie[k]
+        qo[j] = g.newori[k]
+    return 0
+
+# Fill a coord_group. The tables are kept alive by the caller
+cdef int set_group(coord_group* g, int nslot, int ncubie, int nori, \
+                   const stdint.uint8_t[:, ::1] newcubie, \
+                   const stdint.uint8_t[:, ::1] newori) except -1:
+    cdef int i
+    g.nslot = nslot
+    g.ncubie = ncubie
+    g.nori = nori
+    g.nodig = 0
+    if nori > 1:
+        g.nodig = nslot - 1 if nslot == ncubie else nslot
+    g.size = 1
+    for i in range(nslot):
+        g.size = g.size * (ncubie - i)
+    for i in range(g.nodig):
+        g.size = g.size * nori
+    g.newcubie = NULL
+    g.newori = NULL
+    if newcubie is not None:
+        g.newcubie = &newcubie[0, 0]
+        g.newori = &newori[0, 0]
+    return 0
+
+# Rank of one group p (cubie in each slot), o (orientations)
+def rank(p, o, int ncubie, int nori):
+    cdef stdint.uint8_t[MAXSLOT] cp
+    cdef stdint.uint8_t[MAXSLOT] co
+    cdef coord_group g
+    cdef int i
+    set_group(&g, len(p), ncubie, nori, None, None)
+    for i in range(g.nslot):
+        cp[i] = p[i]
+        co[i] = o[i]
+    return coord_rank(&g, cp, co)
+
+# Cubies and orientations of rank r of one group
+def unrank(long long r, int nslot, int ncubie, int nori):
+    cdef stdint.uint8_t[MAXSLOT] cp
+    cdef stdint.uint8_t[MAXSLOT] co
+    cdef coord_group g
+    set_group(&g, nslot, ncubie, nori, None, None)
+    coord_unrank(&g, r, cp, co)
+    return [cp[i] for i in range(nslot)], [co[i] for i in range(nslot)]
+
+# Number of ranks of one group
+def group_size(int nslot, int ncubie, int nori):
+    cdef coord_group g
+    set_group(&g, nslot, ncubie, nori, None, None)
+    return g.size
+
+# Expand one level of the search
+# INPUT
+# db - uint8 table, entries not reached yet hold UNVISITED
+# depth - entries at this depth are expanded, new ones get depth+1
+# groups - list of one or two (nslot, ncubie, nori, newcubie, newori),
+#    the coordinate groups and their move tables (see coord_move)
+# pull - 0 expand the entries at depth into their children
+#        1 scan the unvisited entries and set those with a child at depth.
+#          The moves are closed under inverse so a child at depth is a parent
+# start, end (optional) - only scan the indices start to end-1
+#    (end < 0 for the rest of the table)
+# OUTPUT number of entries set to depth+1
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def bfs_level(stdint.uint8_t[::1] db, int depth, groups, int pull, \
+              Py_ssize_t start=0, Py_ssize_t end=-1):
+    cdef stdint.uint8_t[MAXGROUP][MAXSLOT] p
+    cdef stdint.uint8_t[MAXGROUP][MAXSLOT] o
+    cdef stdint.uint8_t[MAXGROUP][MAXSLOT] q
+    cdef stdint.uint8_t[MAXGROUP][MAXSLOT] qo
+    cdef coord_group[MAXGROUP] g
+    cdef int ngroup = len(groups)
+    cdef Py_ssize_t idx
+    cdef Py_ssize_t n = db.shape[0]
+    cdef long long child, r
+    cdef long long nnew = 0
+    cdef int m, k
+    cdef stdint.uint8_t cur = depth
+    cdef stdint.uint8_t nxt = depth + 1
+    cdef stdint.uint8_t unvisited = UNVISITED
+    if ngroup < 1 or ngroup > MAXGROUP:
+        raise ValueError('A coordinate has 1 to {0:d} groups'.format(MAXGROUP))
+    for k in range(ngroup):
+        nslot, ncubie, nori, newcubie, newori = groups[k]
+        set_group(&g[k], nslot, ncubie, nori, newcubie, newori)
+    if end < 0 or end > n:
+        end = n
+    with nogil:
+        for idx in range(start, end):
+            if pull == 0:
+                if db[idx] != cur:
+                    continue
+            elif db[idx] != unvisited:
+                continue
+            r = idx
+            for k in range(ngroup - 1, -1, -1):
+                coord_unrank(&g[k], r % g[k].size, p[k], o[k])
+                r = r // g[k].size
+            for m in range(NMOVES):
+                child = 0
+                for k in range(ngroup):
+                    coord_move(&g[k], p[k], o[k], q[k], qo[k], m)
+                    child = child * g[k].size + coord_rank(&g[k], q[k], qo[k])
+                if pull == 0:
+                    if db[child] == unvisited:
+                        db[child] = nxt
+                        nnew = nnew + 1
+                elif db[child] == cur:
+                    db[idx] = nxt
+                    nnew = nnew + 1
+                    break
+    return nnew
+
+# Number of entries start to end-1 of the table that hold value
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def count_value(stdint.uint8_t[::1] db, int value, Py_ssize_t start=0, \
+                Py_ssize_t end=-1):
+    cdef Py_ssize_t idx
+    cdef long long cnt = 0
+    cdef stdint.uint8_t val = value
+    if end < 0 or end > db.shape[0]:
+        end = db.shape[0]
+    with nogil:
+        for idx in range(start, end):
+            if db[idx] == val:
+                cnt = cnt + 1
+    return cnt
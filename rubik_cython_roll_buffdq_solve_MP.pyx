@@ -22,12 +22,170 @@ cimport cython
 
 cimport libc.stdlib as lib
 from libc cimport stdint
-from libc.string cimport memcpy
+from libc.string cimport memcpy, memset, memcmp
 import numpy
 cimport numpy
 
 ctypedef numpy.int16_t DTYPE_t
 
+# Lehmer rank of n cubies out of ncubie (c holds 0..ncubie-1) with the
+#  hardware popcount or with BMI2 pext. Without -mpopcnt gcc makes
+#  __builtin_popcount a library call so these are compiled for their
+#  instructions with the target attribute and only called when the cpu
+#  has them (see rank_cpu_features)
+#  popcnt - digit = c - number of smaller cubies already seen
+#  pext - digit = position of c among the cubies not seen yet, i.e. the
+#         number of trailing zeros of pext(1 << c, not seen)
+cdef extern from *:
+    """
+    #if defined(__GNUC__) && (defined(__x86_64__) || defined(__i386__))
+    #include <immintrin.h>
+    #define RANK_X86 1
+    __attribute__((target("popcnt")))
+    static long lehmer_rank_popcnt(const unsigned char* c, int n, int ncubie) {
+        unsigned int seen = 0;
+        long r = 0;
+        int i;
+        for (i = 0; i < n; i++) {
+            r = r * (ncubie - i) + c[i] - __builtin_popcount(seen & ((1u << c[i]) - 1));
+            seen |= 1u << c[i];
+        }
+        return r;
+    }
+    __attribute__((target("popcnt,bmi,bmi2")))
+    static long lehmer_rank_pext(const unsigned char* c, int n, int ncubie) {
+        unsigned int avail = (1u << ncubie) - 1;
+        long r = 0;
+        int i;
+        for (i = 0; i < n; i++) {
+            r = r * (ncubie - i) + _tzcnt_u32(_pext_u32(1u << c[i], avail));
+            avail ^= 1u << c[i];
+        }
+        return r;
+    }
+    static int rank_cpu_features(void) {
+        __builtin_cpu_init();
+        return (__builtin_cpu_supports("popcnt") ? 1 : 0) |
+               (__builtin_cpu_supports("bmi2") ? 2 : 0) |
+               (__builtin_cpu_supports("avx2") ? 4 : 0);
+    }
+    #else
+    #define RANK_X86 0
+    static long lehmer_rank_popcnt(const unsigned char* c, int n, int ncubie) { return -1; }
+    static long lehmer_rank_pext(const unsigned char* c, int n, int ncubie) { return -1; }
+    static int rank_cpu_features(void) { return 0; }
+    #endif
+    """
+    long lehmer_rank_popcnt(const stdint.uint8_t* c, int n, int ncubie) nogil
+    long lehmer_rank_pext(const stdint.uint8_t* c, int n, int ncubie) nogil
+    int rank_cpu_features() nogil
+
+# Hint the cpu to start loading the cache line at p. Never faults so it
+#  is safe for any address. No-op on compilers without __builtin_prefetch
+cdef extern from *:
+    """
+    #if defined(__GNUC__)
+    #define prefetch_line(p) __builtin_prefetch((p), 0, 1)
+    #else
+    #define prefetch_line(p) ((void)(p))
+    #endif
+    """
+    void prefetch_line(const void* p) nogil
+
+# Rank of one group of cubies in RANK_NB lanes at once (the 18 children of
+#  a node, see rank_children). Slot i of lane j is at [i*RANK_NB + j] in
+#  cub and ori. The lehmer digit of slot i is its cubie minus the number
+#  of smaller cubies in the slots before it, counted with byte compares
+#  16 lanes at a time. The rank is then sum_i digit_i*wd[i] + ori_i*wo[i]
+#  (the mixed radix number with its place values precomputed) added up
+#  in uint32 lanes so it needs the group size to fit 32 bits. Only the
+#  first RANK_NOUT lanes are written to out.
+#  rank_batch_avx2 is the same code compiled for avx2 and is only called
+#  when the cpu has it
+cdef extern from *:
+    """
+    #define RANK_NB 32
+    #define RANK_NOUT 20
+    #if defined(__GNUC__)
+    typedef unsigned char rank_vb __attribute__((vector_size(16)));
+    typedef unsigned int rank_vw __attribute__((vector_size(16)));
+    static inline __attribute__((always_inline)) void rank_batch_body(
+            const unsigned char* cub, const unsigned char* ori, int nslot, int nodig,
+            const unsigned int* wd, const unsigned int* wo, unsigned int* out) {
+        rank_vw acc[RANK_NOUT/4];
+        rank_vb cur, prev, d;
+        rank_vw w;
+        int i, k, h, q;
+        for (q = 0; q < RANK_NOUT/4; q++)
+            acc[q] = (rank_vw){0, 0, 0, 0};
+        for (i = 0; i < nslot; i++) {
+            for (h = 0; h < 2; h++) {
+                memcpy(&cur, cub + i*RANK_NB + h*16, 16);
+                d = cur;
+                for (k = 0; k < i; k++) {
+                    memcpy(&prev, cub + k*RANK_NB + h*16, 16);
+                    d += (rank_vb)(prev < cur);
+                }
+                for (q = 0; q < 4 && h*4 + q < RANK_NOUT/4; q++) {
+                    w = (rank_vw){d[q*4], d[q*4+1], d[q*4+2], d[q*4+3]};
+                    acc[h*4 + q] += w * wd[i];
+                }
+            }
+        }
+        for (i = 0; i < nodig; i++) {
+            for (h = 0; h < 2; h++) {
+                memcpy(&cur, ori + i*RANK_NB + h*16, 16);
+                for (q = 0; q < 4 && h*4 + q < RANK_NOUT/4; q++) {
+                    w = (rank_vw){cur[q*4], cur[q*4+1], cur[q*4+2], cur[q*4+3]};
+                    acc[h*4 + q] += w * wo[i];
+                }
+            }
+        }
+        memcpy(out, acc, sizeof(acc));
+    }
+    static void rank_batch(const unsigned char* cub, const unsigned char* ori, int nslot,
+            int nodig, const unsigned int* wd, const unsigned int* wo, unsigned int* out) {
+        rank_batch_body(cub, ori, nslot, nodig, wd, wo, out);
+    }
+    #if RANK_X86
+    __attribute__((target("avx2")))
+    static void rank_batch_avx2(const unsigned char* cub, const unsigned char* ori, int nslot,
+            int nodig, const unsigned int* wd, const unsigned int* wo, unsigned int* out) {
+        rank_batch_body(cub, ori, nslot, nodig, wd, wo, out);
+    }
+    #else
+    #define rank_batch_avx2 rank_batch
+    #endif
+    #else
+    static void rank_batch(const unsigned char* cub, const unsigned char* ori, int nslot,
+            int nodig, const unsigned int* wd, const unsigned int* wo, unsigned int* out) {
+        int i, k, j;
+        unsigned int d;
+        for (j = 0; j < RANK_NOUT; j++) {
+            out[j] = 0;
+            for (i = 0; i < nslot; i++) {
+                d = cub[i*RANK_NB + j];
+                for (k = 0; k < i; k++)
+                    d -= cub[k*RANK_NB + j] < cub[i*RANK_NB + j];
+                out[j] += d * wd[i];
+            }
+            for (i = 0; i < nodig; i++)
+                out[j] += ori[i*RANK_NB + j] * wo[i];
+        }
+    }
+    #define rank_batch_avx2 rank_batch
+    #endif
+    """
+    enum:
+        RANK_NB
+        RANK_NOUT
+    void rank_batch(const stdint.uint8_t* cub, const stdint.uint8_t* ori, int nslot, \
+                    int nodig, const stdint.uint32_t* wd, const stdint.uint32_t* wo, \
+                    stdint.uint32_t* out) nogil
+    void rank_batch_avx2(const stdint.uint8_t* cub, const stdint.uint8_t* ori, int nslot, \
+                         int nodig, const stdint.uint32_t* wd, const stdint.uint32_t* wo, \
+                         stdint.uint32_t* out) nogil
+
 @cython.boundscheck(False) # turn off bounds-checking for entire function
 @cython.wraparound(False)  # turn off negative index wrapping for entire function
 
@@ -124,156 +282,1116 @@ cdef move_with_cython(stdint.uint8_t* fc, stdint.uint8_t* newmoves, int* allowed
 
 # again putting constant factors once in module saves time
 # and they are availble in the function scope
-# Hard code factors for corner lehmer coding
+# Faces for corner and edge lehmer coding
 cdef int[8] corner_p_idx = [42,44,40,46,36,34,38,32]
-cdef int[8] corner_factors = [5040,720,120,24,6,2,1,1]
-cdef int[256] corner_bincount = [0,1,1,2,1,2,2,3,1,2,2,3,2,3,3,4,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8]
-cdef int[7] corner_ternaryfactors = [729,243,81,27,9,3,1]
-
-# Hard code factors for edge lehmer coding
 cdef int[12] edge_p_idx = [43,41,45,47,25,13,29,9,35,37,33,39]
-cdef int[12] edge_factors = [39916800,3628800,362880,40320,5040,720,120,24,6,2,1,1]
-cdef int[4096] edge_bincount = [0,1,1,2,1,2,2,3,1,2,2,3,2,3,3,4,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,7,8,8,9,8,9,9,10,8,9,9,10,9,10,10,11,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,7,8,8,9,8,9,9,10,8,9,9,10,9,10,10,11,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,7,8,8,9,8,9,9,10,8,9,9,10,9,10,10,11,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,7,8,8,9,8,9,9,10,8,9,9,10,9,10,10,11,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,7,8,8,9,8,9,9,10,8,9,9,10,9,10,10,11,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,7,8,8,9,8,9,9,10,8,9,9,10,9,10,10,11,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,7,8,8,9,8,9,9,10,8,9,9,10,9,10,10,11,7,8,8,9,8,9,9,10,8,9,9,10,9,10,10,11,8,9,9,10,9,10,10,11,9,10,10,11,10,11,11,12]
-
-# Hard code factors for edge1 lehmer coding
-# Factors for 12 pick 7
+# Faces for the two 12 pick 7 edge codes
 cdef int[7] edge1_p_idx = [43,45,25,29,35,33,41]
-cdef int[7] edge1_factors = [332640,30240,3024,336,42,6,1]
-cdef int[7] edge1_binaryfactors = [64,32,16,8,4,2,1]
 cdef int[7] edge2_p_idx = [41,47,13,9,37,39,43]
+# Number of ones in every 12 bit number. Counts the cubies already seen
+#  in a lehmer rank when the cpu has no popcount instruction
+cdef int[4096] edge_bincount = [0,1,1,2,1,2,2,3,1,2,2,3,2,3,3,4,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,7,8,8,9,8,9,9,10,8,9,9,10,9,10,10,11,1,2,2,3,2,3,3,4,2,3,3,4,3,4,4,5,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,7,8,8,9,8,9,9,10,8,9,9,10,9,10,10,11,2,3,3,4,3,4,4,5,3,4,4,5,4,5,5,6,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,7,8,8,9,8,9,9,10,8,9,9,10,9,10,10,11,3,4,4,5,4,5,5,6,4,5,5,6,5,6,6,7,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,7,8,8,9,8,9,9,10,8,9,9,10,9,10,10,11,4,5,5,6,5,6,6,7,5,6,6,7,6,7,7,8,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,7,8,8,9,8,9,9,10,8,9,9,10,9,10,10,11,5,6,6,7,6,7,7,8,6,7,7,8,7,8,8,9,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,7,8,8,9,8,9,9,10,8,9,9,10,9,10,10,11,6,7,7,8,7,8,8,9,7,8,8,9,8,9,9,10,7,8,8,9,8,9,9,10,8,9,9,10,9,10,10,11,7,8,8,9,8,9,9,10,8,9,9,10,9,10,10,11,8,9,9,10,9,10,10,11,9,10,10,11,10,11,11,12]
+
+# Ways lehmer_rank counts the cubies already seen
+#  RANK_TABLE - the edge_bincount table (any cpu)
+#  RANK_POPCNT - the popcnt instruction
+#  RANK_PEXT - the BMI2 pext and tzcnt instructions
+cdef enum:
+    RANK_TABLE = 0
+    RANK_POPCNT = 1
+    RANK_PEXT = 2
+RANK_PATH_NAMES = ['table', 'popcnt', 'pext']
+# Instructions the cpu has (bit 0 popcnt, bit 1 bmi2, bit 2 avx2) and the
+#  path used.
+#  Picked once when the module loads, pext first then popcnt (see
+#  rubik_rank_bench.py). On cpus where pext is microcoded (AMD before
+#  Zen 3) use set_rank_path(RANK_POPCNT)
+cdef int rank_features = rank_cpu_features()
+cdef int rank_path = RANK_PEXT if rank_features & 3 == 3 else \
+                     (RANK_POPCNT if rank_features & 1 else RANK_TABLE)
+
+# Lehmer rank of n cubies out of ncubie counting the seen ones with the table
+cdef inline long lehmer_rank_table(const stdint.uint8_t* c, int n, int ncubie):
+    cdef unsigned int seen = 0
+    cdef long r = 0
+    cdef int i
+    for i in range(n):
+        r = r * (ncubie - i) + c[i] - edge_bincount[seen & ((1u << c[i]) - 1)]
+        seen = seen | (1u << c[i])
+    return r
+
+# Lehmer rank of the n cubies c (0..ncubie-1), the lehmer digit of
+#  cubie i has radix ncubie-i. Every ranking in the search goes
+#  through here
+cdef inline long lehmer_rank(const stdint.uint8_t* c, int n, int ncubie):
+    if rank_path == RANK_POPCNT:
+        return lehmer_rank_popcnt(c, n, ncubie)
+    if rank_path == RANK_PEXT:
+        return lehmer_rank_pext(c, n, ncubie)
+    return lehmer_rank_table(c, n, ncubie)
+
+# Number of codes lehmer_code_faces fills in finalstates
+#  0 corner, 1 alledge, 2 edge1, 3 edge2, 4 symmetry reduced corner,
+#  5 edge1 code of the cube conjugated by edge1_sym
+#  These must match the CODE_* values in rubik_pattern_db.py
+cdef enum:
+    NLEHCODE = 6
+    CODE_CORNER_SYM = 4
+    CODE_EDGE1_SYM = 5
+# A database ranked by its own set of cubies (a spec from
+#  rubik_cube_fast_dbgen.py) instead of one of the lehmer codes
+    CODE_SPEC = 6
+
+# Tables for the symmetry reduced corner code. They are filled in
+#  by set_corner_symmetry() from rubik_cube_symmetry.py
+#  Conjugating fc by symmetry s is
+#  fcsym[q] = sym_relabel[s][fc[sym_src[s][q]]]
+cdef stdint.uint8_t[48][48] sym_src
+cdef stdint.uint8_t[48][128] sym_relabel
+# Class of each corner permutation rank and the symmetry that
+#  takes it to the class representative
+cdef int[40320] corner_sym_class
+cdef stdint.uint8_t[40320] corner_sym_sym
+cdef int corner_sym_on = 0 # set once the tables are filled
+# The symmetry for the conjugated edge1 code. The conjugated cube
+#  looked up in the edge1 database gives the distance for the 7 edges
+#  of the symmetric image of the edge1 set. Set by set_edge1_symmetry()
+cdef int edge1_sym = 0
+cdef int edge1_sym_on = 0
+
+# 12 pick 7 edge code of the faceids in 7 edge faces
+#  lehmer rank * 128 + the orientations in binary
+cdef inline int edge12p7_code(const stdint.uint8_t* ids):
+    cdef stdint.uint8_t[7] cubies
+    cdef int i2
+    cdef int orient = 0
+    for i2 in range(7):
+        cubies[i2] = (ids[i2] >> 2) - 8 # The -8 is there because the corners are listed first
+        orient = orient * 2 + (ids[i2] & 3)
+    return lehmer_rank(cubies, 7, 12) * 128 + orient
 
 # See BottoB for description
-#  This is the slowest function; 3 times slower than the face move
+#  This was the slowest function; 3 times slower than the face move.
+#  The lehmer digits are now counted by lehmer_rank with the fastest
+#  instruction the cpu has
+#  finalstates needs room for NLEHCODE codes. The symmetry reduced corner
+#  code (finalstates[4]) is only calculated after set_corner_symmetry()
+#  and the conjugated edge1 code (finalstates[5]) after set_edge1_symmetry()
 cdef void lehmer_code_faces(stdint.uint8_t* fc, int* finalstates):
-    
-    cdef int nCrnr = 8
-    cdef int nCrnrOrn = 7
-    cdef int nEdge = 12
-    cdef int nEdge1 = 7
-    cdef Py_ssize_t  i2
-    cdef int rshift, numOnes
-
-    cdef int[8] corner_ids
-    cdef unsigned char[8] corner_p
-    cdef unsigned char[7] corner_op
-    cdef unsigned char[8] corner_lehmer
-    cdef unsigned char corner_seen
-    # Variables to deal with edge lehmer coding
-    cdef int[12] edge_ids
-    cdef unsigned short[12] edge_p
-    cdef int[18] edge_state
-    cdef unsigned short[12] edge_lehmer
-    cdef unsigned short edge_seen
-    # Variables to deal with edge1 lehmer coding
-    cdef int[7] edge1_ids
-    cdef unsigned short[7] edge1_p
-    cdef unsigned short[7] edge1_op
-    cdef unsigned short[7] edge1_lehmer
-    cdef unsigned short edge1_seen
-    
-    #str = ''
-    for i2 in range(nCrnr):
-        corner_ids[i2] = fc[corner_p_idx[i2]]
-    #    str = str + ',{0:d}'.format(corner_ids[i2])
-    #print('Corner Faces Used ',str)
-    for i2 in range(nCrnr):
-        corner_p[i2] = corner_ids[i2] >> 2
-        if i2 < nCrnr - 1:
-            corner_op[i2] = corner_ids[i2] & 3
-    corner_lehmer[0] = corner_p[0]
-    corner_seen = 0
-    corner_seen = corner_seen | (0b1 << (nCrnr - corner_p[0] - 1))
-    for i2 in range(1,nCrnr):
-        corner_seen = corner_seen | (0b1 << (nCrnr - corner_p[i2] - 1 ))
-        rshift = nCrnr - corner_p[i2]
-        numOnes = corner_bincount[corner_seen >> rshift]
-        corner_lehmer[i2] = corner_p[i2] - numOnes
-
-    rshift = 0
-    for i2 in range(nCrnr):
-        rshift = rshift + corner_lehmer[i2] * corner_factors[i2]
-    rshift = rshift * 2187
+    cdef Py_ssize_t i2
+    cdef int numOnes, cperm, csym
+    cdef stdint.uint8_t[12] cubies
+    cdef stdint.uint8_t[7] ids
+
+    # Corner permutation then the orientation of the first 7 corners
+    for i2 in range(8):
+        cubies[i2] = fc[corner_p_idx[i2]] >> 2
+    cperm = lehmer_rank(cubies, 8, 8)
     numOnes = 0
-    for i2 in range(nCrnrOrn):
-        numOnes = numOnes + corner_op[i2] * corner_ternaryfactors[i2]
-    finalstates[0] = rshift + numOnes
-    
+    for i2 in range(7):
+        numOnes = numOnes * 3 + (fc[corner_p_idx[i2]] & 3)
+    finalstates[0] = cperm * 2187 + numOnes
+
+    # Symmetry reduced corner code. Conjugate the cube by the symmetry
+    #  that takes the corner permutation to its class representative.
+    #  Only the corner faces used for the orientation need conjugating
+    #  since the class number already stands for the permutation
+    if corner_sym_on:
+        csym = corner_sym_sym[cperm]
+        numOnes = 0
+        for i2 in range(7):
+            numOnes = numOnes * 3 + (sym_relabel[csym][fc[sym_src[csym][corner_p_idx[i2]]]] & 3)
+        finalstates[4] = corner_sym_class[cperm] * 2187 + numOnes
+
     # Calculate the edge state
-    #str = ''
-    for i2 in range(nEdge):
-        edge_ids[i2] = fc[edge_p_idx[i2]]
-        edge_p[i2] = (edge_ids[i2] >> 2) - 8 # The -8 is there because the corners are listed first
-    #    str = str + ',{0:d}'.format(edge_ids[i2])
-    #print('Edge Faces Used: ',str)
-    edge_lehmer[0] = edge_p[0]
-    edge_seen = 0
-    edge_seen = edge_seen | (0b1 << (nEdge - edge_p[0] - 1))
-    for i2 in range(1,nEdge):
-        edge_seen = edge_seen | (0b1 << (nEdge - edge_p[i2] - 1 ))
-        rshift = nEdge - edge_p[i2]
-        numOnes = edge_bincount[edge_seen >> rshift]
-        edge_lehmer[i2] = edge_p[i2] - numOnes
-    rshift = 0
-    for i2 in range(nEdge):
-        rshift = rshift + edge_lehmer[i2] * edge_factors[i2]
-    finalstates[1] = rshift
-    
-    # Calculate the edge1 state
-    for i2 in range(nEdge1):
-        edge1_ids[i2] = fc[edge1_p_idx[i2]]
-    for i2 in range(nEdge1):
-        edge1_p[i2] = (edge1_ids[i2] >> 2) - 8 # The -8 is there because the corners are listed first
-        edge1_op[i2] = edge1_ids[i2] & 3
-    edge1_lehmer[0] = edge1_p[0]
-    edge1_seen = 0
-    edge1_seen = edge1_seen | (0b1 << (nEdge - edge1_p[0] - 1))
-    for i2 in range(1,nEdge1):
-        edge1_seen = edge1_seen | (0b1 << (nEdge - edge1_p[i2] - 1 ))
-        rshift = nEdge - edge1_p[i2]
-        numOnes = edge_bincount[edge1_seen >> rshift]
-        edge1_lehmer[i2] = edge1_p[i2] - numOnes
-
-    rshift = 0
-    for i2 in range(nEdge1):
-        rshift = rshift + edge1_lehmer[i2] * edge1_factors[i2]
-    # 12 pick 6
-    #rshift = rshift * 64
-    # 12 pick 7
-    rshift = rshift * 128
-    numOnes = 0
-    for i2 in range(nEdge1):
-        numOnes = numOnes + edge1_op[i2] * edge1_binaryfactors[i2]
-
-    finalstates[2] = rshift + numOnes
-
-    # Calculate the edge12 state
-    for i2 in range(nEdge1):
-        edge1_ids[i2] = fc[edge2_p_idx[i2]]
-    for i2 in range(nEdge1):
-        edge1_p[i2] = (edge1_ids[i2] >> 2) - 8 # The -8 is there because the corners are listed first
-        edge1_op[i2] = edge1_ids[i2] & 3
-    edge1_lehmer[0] = edge1_p[0]
-    edge1_seen = 0
-    edge1_seen = edge1_seen | (0b1 << (nEdge - edge1_p[0] - 1))
-    for i2 in range(1,nEdge1):
-        edge1_seen = edge1_seen | (0b1 << (nEdge - edge1_p[i2] - 1 ))
-        rshift = nEdge - edge1_p[i2]
-        numOnes = edge_bincount[edge1_seen >> rshift]
-        edge1_lehmer[i2] = edge1_p[i2] - numOnes
-
-    rshift = 0
-    for i2 in range(nEdge1):
-        rshift = rshift + edge1_lehmer[i2] * edge1_factors[i2]
-    # 12 pick 6
-    #rshift = rshift * 64
-    # 12 pick 7
-    rshift = rshift * 128
-    numOnes = 0
-    for i2 in range(nEdge1):
-        numOnes = numOnes + edge1_op[i2] * edge1_binaryfactors[i2]
+    for i2 in range(12):
+        cubies[i2] = (fc[edge_p_idx[i2]] >> 2) - 8 # The -8 is there because the corners are listed first
+    finalstates[1] = lehmer_rank(cubies, 12, 12)
+
+    # Calculate the edge1 and edge2 states
+    for i2 in range(7):
+        ids[i2] = fc[edge1_p_idx[i2]]
+    finalstates[2] = edge12p7_code(ids)
+    for i2 in range(7):
+        ids[i2] = fc[edge2_p_idx[i2]]
+    finalstates[3] = edge12p7_code(ids)
+
+    # Calculate the edge1 state of the conjugated cube
+    if edge1_sym_on:
+        for i2 in range(7):
+            ids[i2] = sym_relabel[edge1_sym][fc[sym_src[edge1_sym][edge1_p_idx[i2]]]]
+        finalstates[5] = edge12p7_code(ids)
+
+# Storage formats for the pattern databases
+#  These must match DB_INT16, DB_NIBBLE, DB_MOD3, DB_NONE in rubik_pattern_db.py
+cdef enum:
+    DB_INT16 = 0 # one int16 per entry
+    DB_NIBBLE = 1 # two entries per byte. Even index in the low 4 bits
+    DB_MOD3 = 2 # distance mod 3 four entries per byte
+    DB_NONE = 3 # database not loaded. Its heuristic is always 0
 
-    finalstates[3] = rshift + numOnes
+# Index layouts of the pattern databases
+#  These must match LAYOUT_STD, LAYOUT_GROUPED in rubik_pattern_db.py
+#  LAYOUT_GROUPED moves the lehmer digits and orientations of the last
+#  positions in the code (the U face ones) to the low part of the index,
+#  so the children from the U face moves stay on the same memory page
+cdef enum:
+    LAYOUT_STD = 0
+    LAYOUT_GROUPED = 1
 
+cdef extern from "zlib.h":
+    int uncompress(unsigned char* dest, unsigned long* destLen, \
+                   const unsigned char* source, unsigned long sourceLen)
+    int Z_OK
+
+# A pattern database kept zlib compressed in blocks of chunk entries
+#  (a .pdbz file with small blocks, see rubik_pattern_db.py) with an LRU
+#  cache of nslots decompressed blocks
+#  block i is comp[offsets[i]:offsets[i+1]]
+#  The slots are linked from most (head) to least (tail) recently used by
+#  slot_prev and slot_next. block_slot is the slot holding each block or -1
+#  errors counts blocks that failed to decompress. They read as all 0
+cdef struct block_cache:
+    const stdint.uint8_t* comp
+    const stdint.int64_t* offsets
+    long nblocks
+    long chunk
+    long blockbytes
+    int nslots
+    stdint.uint8_t* slots
+    int* slot_block
+    int* slot_prev
+    int* slot_next
+    int* block_slot
+    int head
+    int tail
+    long long hits
+    long long misses
+    long long errors
+
+# Move cache slot s to the most recently used end of the list
+cdef inline void lru_front(block_cache* c, int s):
+    cdef int prv, nxt
+    if s == c.head:
+        return
+    prv = c.slot_prev[s]
+    nxt = c.slot_next[s]
+    c.slot_next[prv] = nxt
+    if nxt >= 0:
+        c.slot_prev[nxt] = prv
+    else:
+        c.tail = prv
+    c.slot_prev[s] = -1
+    c.slot_next[s] = c.head
+    c.slot_prev[c.head] = s
+    c.head = s
+
+# Decompressed bytes of block blk. On a miss the least recently used
+#  slot is reused for it. BlockCacheDB checks every block when it is made
+#  so a block that does not decompress (errors) should not happen. Its
+#  zeros would be wrong distances (too large for DB_MOD3) so
+#  DFS_cython_solve and pattern_db_scores raise instead of returning a
+#  result (check_block_errors)
+cdef const stdint.uint8_t* cache_block(block_cache* c, long blk):
+    cdef int s = c.block_slot[blk]
+    cdef unsigned long destlen
+    cdef stdint.uint8_t* dest
+    if s >= 0:
+        c.hits = c.hits + 1
+        lru_front(c, s)
+        return c.slots + s * c.blockbytes
+    c.misses = c.misses + 1
+    s = c.tail
+    if c.slot_block[s] >= 0:
+        c.block_slot[c.slot_block[s]] = -1
+    dest = c.slots + s * c.blockbytes
+    destlen = c.blockbytes
+    if not uncompress(dest, &destlen, c.comp + c.offsets[blk], \
+                      c.offsets[blk+1] - c.offsets[blk]) == Z_OK:
+        memset(dest, 0, c.blockbytes)
+        c.errors = c.errors + 1
+    c.slot_block[s] = blk
+    c.block_slot[blk] = s
+    lru_front(c, s)
+    return dest
+
+# The cube as cubies instead of faceids (DFS_cython_solve with
+#  coordmoves=1). The bytes of a node are
+#  0-7   corner cubie (0-7) in each of the corner_p_idx faces
+#  8-15  its orientation (faceid & 3 in that face)
+#  16-27 edge cubie (0-11) in each of the edge_p_idx faces
+#  28-39 its orientation
+#  40-41 corner permutation coordinate, the lehmer rank of bytes 0-7 (uint16)
+#  42-43 corner orientation coordinate, base 3 digits of bytes 8-14 (uint16)
+#  so the corner code is perm*2187 + orientation without ranking anything.
+#  A move only changes the 4 corners and 4 edges of its face and the two
+#  corner coordinates come from move tables. The edge databases are
+#  ranked from the edge bytes with popcount. A full move table of a 12p7
+#  or all edge code would be several GB
+cdef enum:
+    NODEBYTES = 44
+    NODE_CORI = 8
+    NODE_EDGE = 16
+    NODE_EORI = 28
+    NODE_CPERM = 40
+    NODE_CORICOORD = 42
+    NCORNERPERM = 40320
+    NCORNERORI = 2187
+
+# Most databases DFS_cython_solve takes the max over
+cdef enum:
+    MAXDB = 8
+    MAXSPECSLOT = 12
+# Largest group rank_children ranks with rank_batch. The compares grow
+#  with the square of the slots and for the 12 slots of the all edge code
+#  lehmer_rank one child at a time is faster (bench_child_lookups)
+    BATCHMAXSLOT = 8
+
+# A pattern database is just a pointer to its raw bytes and how
+#  the entries are stored in those bytes
+#  maxval is the largest distance in the database (only used by DB_MOD3)
+#  code is which of the lehmer_code_faces codes indexes the database
+#    or CODE_SPEC
+#  layout is how the code maps to the index in data
+#  cache is set instead of data for a BlockCacheDB
+#  ngroup > 0 the database is ranked from the cubies in the faces of each
+#    group (see spec_index) instead of with lehmer_code_faces. The corner,
+#    alledge, edge1 and edge2 codes are ranked this way as well
+#  solved is the index of the solved cube
+#  slots, oriofs - where the faces of each group are in a cubie node
+#    (see node_index), -1 for a face that is not one of the corner_p_idx
+#    or edge_p_idx faces
+#  cornercoord - the database is the full corner code so its index is the
+#    corner coordinates of a cubie node
+#  batch - every group size fits 32 bits and has at most BATCHMAXSLOT
+#    slots so rank_children ranks it with rank_batch. wdig, wori are the place values of the lehmer and
+#    orientation digits of each group
+#  nodepos - slot of each cubie node byte in each group, -1 if none
+#  consistent - a move changes the distance by at most 1. True when every
+#    group has all the cubies of its kind (corner, alledge and the
+#    symmetry reduced corner). A 12p7 edge database only follows the
+#    cubies in its slots and a move brings in cubies from the slots it
+#    does not have, so its child can be further than 1 away
+cdef struct pattern_db:
+    const stdint.uint8_t* data
+    int fmt
+    int maxval
+    int code
+    int layout
+    block_cache* cache
+    int ngroup
+    int[2] nslot
+    int[2] ncubie
+    int[2] nori
+    int[2] nodig
+    int[2] base
+    int[2][MAXSPECSLOT] faces
+    long[2] gsize
+    long solved
+    int[2][MAXSPECSLOT] slots
+    int[2] oriofs
+    int cornercoord
+    int batch
+    stdint.uint32_t[2][MAXSPECSLOT] wdig
+    stdint.uint32_t[2][MAXSPECSLOT] wori
+    stdint.int8_t[2][NODEBYTES] nodepos
+    int consistent
+
+# Faceids of the solved cube. A configuration is solved when all 48 match
+cdef stdint.uint8_t[48] solved_faces = [2,49,17,65,22,53,5,33,6,52,21,69,26,56,9,37, \
+    10,57,25,73,30,61,13,41,14,60,29,77,18,48,1,45,4,36,8,40,12,44,0,32,16,76,28,72,24,68,20,64]
+# Every move allowed. Used when walking a mod 3 database down to solved
+cdef int[18] all_moves = [0,1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17]
+
+# Index of cube fc in a database ranked by groups of cubies
+#  The same ranking as rubik_cython_dbgen.pyx. For each group the lehmer
+#  digits of the cubies in its faces (radix ncubie-i) then the
+#  orientation digits. When a group has all the cubies of its kind the
+#  last orientation is left out. With two groups the index is
+#  rank of the first * size of the second + rank of the second
+cdef inline long spec_index(const stdint.uint8_t* fc, pattern_db* db):
+    cdef stdint.uint8_t[MAXSPECSLOT] cubies
+    cdef long idx = 0
+    cdef long r
+    cdef int g, i
+    for g in range(db.ngroup):
+        for i in range(db.nslot[g]):
+            cubies[i] = (fc[db.faces[g][i]] >> 2) - db.base[g]
+        r = lehmer_rank(cubies, db.nslot[g], db.ncubie[g])
+        for i in range(db.nodig[g]):
+            r = r * db.nori[g] + (fc[db.faces[g][i]] & 3)
+        idx = idx * db.gsize[g] + r
+    return idx
+
+# Lehmer code or spec index of cube fc for database db
+cdef inline long pdb_index(const stdint.uint8_t* fc, pattern_db* db):
+    cdef int lehcode[NLEHCODE]
+    if db.ngroup > 0:
+        return spec_index(fc, db)
+    lehmer_code_faces(<stdint.uint8_t*>fc, lehcode)
+    return lehcode[db.code]
+
+# For each move the node bytes of the 4 corners and 4 edges it changes,
+#  the byte each one comes from and the orientation added to it
+cdef stdint.uint8_t[18][8] cubie_move_dst
+cdef stdint.uint8_t[18][8] cubie_move_src
+cdef stdint.uint8_t[18][8] cubie_move_ori
+# New corner coordinates after each move
+cdef stdint.uint16_t[NCORNERPERM][18] corner_perm_move
+cdef stdint.uint16_t[NCORNERORI][18] corner_ori_move
+cdef stdint.uint8_t[48] solved_node
+cdef int coord_tables_on = 0 # set once the tables are filled
+cdef stdint.uint8_t[6] add_mod3 = [0,1,2,0,1,2]
+
+# Base 3 digits of the first 7 corner orientations
+cdef inline int corner_ori_rank(const stdint.uint8_t* o):
+    cdef int r = 0
+    cdef int i
+    for i in range(7):
+        r = r * 3 + o[i]
+    return r
+
+# Cubie node of the 48 faceids fc
+cdef void faces_to_node(const stdint.uint8_t* fc, stdint.uint8_t* node):
+    cdef Py_ssize_t j
+    for j in range(8):
+        node[j] = fc[corner_p_idx[j]] >> 2
+        node[NODE_CORI + j] = fc[corner_p_idx[j]] & 3
+    for j in range(12):
+        node[NODE_EDGE + j] = (fc[edge_p_idx[j]] >> 2) - 8
+        node[NODE_EORI + j] = fc[edge_p_idx[j]] & 3
+    (<stdint.uint16_t*>&node[NODE_CPERM])[0] = lehmer_rank(node, 8, 8)
+    (<stdint.uint16_t*>&node[NODE_CORICOORD])[0] = corner_ori_rank(&node[NODE_CORI])
+
+# Same as move_with_cython for a cubie node. The children are written
+#  48 bytes apart like the faceids
+cdef void move_cubies(const stdint.uint8_t* node, stdint.uint8_t* newnodes, \
+                      int* allowed_moves):
+    cdef Py_ssize_t k1, j
+    cdef int kuse
+    cdef stdint.uint8_t* out
+    cdef const stdint.uint8_t* dst
+    cdef const stdint.uint8_t* src
+    cdef const stdint.uint8_t* ori
+    for k1 in range(18):
+        kuse = allowed_moves[k1]
+        if not kuse == -1:
+            out = &newnodes[k1*48]
+            memcpy(out, node, NODEBYTES)
+            dst = cubie_move_dst[kuse]
+            src = cubie_move_src[kuse]
+            ori = cubie_move_ori[kuse]
+            for j in range(4):
+                out[dst[j]] = node[src[j]]
+                out[dst[j] + NODE_CORI] = add_mod3[node[src[j] + NODE_CORI] + ori[j]]
+            for j in range(4, 8):
+                out[dst[j]] = node[src[j]]
+                out[dst[j] + NODE_EORI - NODE_EDGE] = node[src[j] + NODE_EORI - NODE_EDGE] ^ ori[j]
+            (<stdint.uint16_t*>&out[NODE_CPERM])[0] = \
+                corner_perm_move[(<const stdint.uint16_t*>&node[NODE_CPERM])[0]][kuse]
+            (<stdint.uint16_t*>&out[NODE_CORICOORD])[0] = \
+                corner_ori_move[(<const stdint.uint16_t*>&node[NODE_CORICOORD])[0]][kuse]
+
+# Fill the cubie move tables from the facelet moves
+#  Move m puts the faceid of face PERM[m][q] in face q, found by moving
+#  a cube whose faceids are the face numbers. The cubie that lands in the
+#  corner_p_idx (edge_p_idx) face of a slot comes from the slot owning face
+#  PERM[m][q] and its orientation goes up by the label of that face on
+#  the solved cube (the labels of a cubie go round its faces in order)
+cdef init_coord_tables():
+    global coord_tables_on
+    cdef stdint.uint8_t[48] faces
+    cdef stdint.uint8_t[18][48] perm
+    cdef stdint.uint8_t[8] p
+    cdef stdint.uint8_t[8] o
+    cdef stdint.uint8_t[8] q
+    cdef stdint.uint8_t[8] qo
+    cdef int[48] face_byte
+    cdef int[48] face_label
+    cdef Py_ssize_t i, j, m, n, r, digit, tot
+    cdef unsigned int used
+    # Node byte and label of every face, from the cubie that owns it
+    for i in range(48):
+        for j in range(8):
+            if solved_faces[i] >> 2 == solved_faces[corner_p_idx[j]] >> 2:
+                face_byte[i] = j
+        for j in range(12):
+            if solved_faces[i] >> 2 == solved_faces[edge_p_idx[j]] >> 2:
+                face_byte[i] = NODE_EDGE + j
+        face_label[i] = solved_faces[i] & 3
+        faces[i] = i
+    move_with_cython(faces, <stdint.uint8_t*>perm, all_moves)
+    for m in range(18):
+        n = 0
+        for j in range(8):
+            i = perm[m][corner_p_idx[j]]
+            if not face_byte[i] == j:
+                cubie_move_dst[m][n] = j
+                cubie_move_src[m][n] = face_byte[i]
+                cubie_move_ori[m][n] = face_label[i]
+                n = n + 1
+        for j in range(12):
+            i = perm[m][edge_p_idx[j]]
+            if not face_byte[i] == NODE_EDGE + j:
+                cubie_move_dst[m][n] = NODE_EDGE + j
+                cubie_move_src[m][n] = face_byte[i]
+                cubie_move_ori[m][n] = face_label[i]
+                n = n + 1
+        if not n == 8:
+            raise ValueError('Move {0:d} does not change 4 corners and 4 edges'.format(m))
+    # Corner permutation coordinate
+    for r in range(NCORNERPERM):
+        used = 0
+        digit = r
+        for i in range(7, -1, -1):
+            q[i] = digit % (8 - i)
+            digit = digit // (8 - i)
+        for i in range(8):
+            digit = q[i]
+            j = 0
+            while (used >> j) & 1 or digit > 0:
+                if not (used >> j) & 1:
+                    digit = digit - 1
+                j = j + 1
+            p[i] = j
+            used = used | (1u << j)
+        for m in range(18):
+            memcpy(q, p, 8)
+            for n in range(4):
+                q[cubie_move_dst[m][n]] = p[cubie_move_src[m][n]]
+            corner_perm_move[r][m] = lehmer_rank(q, 8, 8)
+    # Corner orientation coordinate. The last one makes the sum 0 mod 3
+    for r in range(NCORNERORI):
+        digit = r
+        tot = 0
+        for i in range(6, -1, -1):
+            o[i] = digit % 3
+            tot = tot + o[i]
+            digit = digit // 3
+        o[7] = (3 - tot % 3) % 3
+        for m in range(18):
+            memcpy(qo, o, 8)
+            for n in range(4):
+                qo[cubie_move_dst[m][n]] = (o[cubie_move_src[m][n]] + cubie_move_ori[m][n]) % 3
+            corner_ori_move[r][m] = corner_ori_rank(qo)
+    faces_to_node(solved_faces, solved_node)
+    coord_tables_on = 1
+
+# The inverse (dual) cube. A cube is a permutation pi of the faces,
+#  face q holds the faceid face pi(q) has when solved. Its inverse puts
+#  the solved faceid of face q in face pi(q). A move m does
+#  pi -> pi o P_m (P_m the face permutation of move_with_cython) so the
+#  inverse goes to P_m^-1 o pi^-1, which only relabels its faceids:
+#  solved faceid of face r becomes the one of face P_m^-1(r). The inverse
+#  is as far from solved as the cube so its database distances are lower
+#  bounds for the cube as well (Korf's dual lookup)
+cdef stdint.uint8_t[18][128] dual_relabel
+cdef stdint.uint8_t[128] solved_face_of # face of each faceid when solved
+cdef int dual_tables_on = 0
+
+cdef init_dual_tables():
+    global dual_tables_on
+    cdef stdint.uint8_t[48] faces
+    cdef stdint.uint8_t[18][48] perm
+    cdef Py_ssize_t q, m
+    for q in range(48):
+        faces[q] = q
+        solved_face_of[solved_faces[q]] = q
+    move_with_cython(faces, <stdint.uint8_t*>perm, all_moves)
+    for m in range(18):
+        for q in range(48):
+            dual_relabel[m][solved_faces[perm[m][q]]] = solved_faces[q]
+    dual_tables_on = 1
+
+# Faceids of the inverse of cube fc
+cdef inline void inverse_faces(const stdint.uint8_t* fc, stdint.uint8_t* inv):
+    cdef Py_ssize_t q
+    for q in range(48):
+        inv[solved_face_of[fc[q]]] = solved_faces[q]
+
+# Faceids of the inverse of the child by move m from the inverse of its parent
+cdef inline void move_inverse(const stdint.uint8_t* inv, int m, stdint.uint8_t* newinv):
+    cdef const stdint.uint8_t* relabel = dual_relabel[m]
+    cdef Py_ssize_t q
+    for q in range(48):
+        newinv[q] = relabel[inv[q]]
+
+# Index of a cubie node for database db. Same value as pdb_index of the
+#  faceids the node came from
+cdef inline long node_index(const stdint.uint8_t* node, pattern_db* db):
+    cdef stdint.uint8_t[MAXSPECSLOT] cubies
+    cdef long idx = 0
+    cdef long r
+    cdef int g, i
+    if db.cornercoord:
+        return (<const stdint.uint16_t*>&node[NODE_CPERM])[0] * NCORNERORI + \
+               (<const stdint.uint16_t*>&node[NODE_CORICOORD])[0]
+    for g in range(db.ngroup):
+        for i in range(db.nslot[g]):
+            cubies[i] = node[db.slots[g][i]]
+        r = lehmer_rank(cubies, db.nslot[g], db.ncubie[g])
+        for i in range(db.nodig[g]):
+            r = r * db.nori[g] + node[db.slots[g][i] + db.oriofs[g]]
+        idx = idx * db.gsize[g] + r
+    return idx
+
+# Index of a faceid configuration or of a cubie node (coordmode=1)
+cdef inline long state_index(const stdint.uint8_t* state, pattern_db* db, int coordmode):
+    if coordmode:
+        return node_index(state, db)
+    return pdb_index(state, db)
+
+# Children of a faceid configuration or of a cubie node (coordmode=1)
+cdef inline void move_state(stdint.uint8_t* state, stdint.uint8_t* newstates, \
+                            int* allowed_moves, int coordmode):
+    if coordmode:
+        move_cubies(state, newstates, allowed_moves)
+    else:
+        move_with_cython(state, newstates, allowed_moves)
+
+# Cubie and orientation in slot i of child j at [i*RANK_NB + j] (structure
+#  of arrays) for rank_batch. Lanes 18 and up are never written
+cdef stdint.uint8_t[MAXSPECSLOT*RANK_NB] batch_cubies
+cdef stdint.uint8_t[MAXSPECSLOT*RANK_NB] batch_oris
+cdef stdint.uint32_t[RANK_NB] batch_ranks
+# Use the avx2 build of rank_batch
+cdef int batch_avx2 = rank_features & 4
+
+# Index of all 18 children in each of the ndb databases, childidx[k*18 + j]
+#  is child j (move allowed_moves[j]) in database k. state is the parent
+#  and newstates the children as move_state made them. The slots of a
+#  group go into lanes, one per child, and rank_batch ranks all of them
+#  at once. For a cubie node the lanes are filled from the parent and only
+#  the slots the move changes are written over, the 4 cubies it moves,
+#  instead of reading the slots of 18 child nodes.
+#  The symmetry codes, the corner coordinates and groups too big for
+#  rank_batch use state_index one child at a time. Children of the moves
+#  that are not allowed are left out or get garbage, they are never
+#  looked up
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void rank_children(const stdint.uint8_t* state, const stdint.uint8_t* newstates, \
+                        int* allowed_moves, pattern_db* pdbs, int ndb, int coordmode, \
+                        long* childidx):
+    cdef pattern_db* db
+    cdef long* idx
+    cdef stdint.uint8_t* cub
+    cdef stdint.uint8_t* ori
+    cdef const stdint.uint8_t* dst
+    cdef const stdint.uint8_t* src
+    cdef const stdint.uint8_t* mvori
+    cdef stdint.uint8_t c, o
+    cdef int k, g, i, j, n, m, face, pos, nlo, nhi
+    for k in range(ndb):
+        db = &pdbs[k]
+        idx = &childidx[k*18]
+        if db.fmt == DB_NONE:
+            continue
+        if db.ngroup == 0 or not db.batch or (coordmode and db.cornercoord):
+            for j in range(18):
+                if not allowed_moves[j] == -1:
+                    idx[j] = state_index(&newstates[j*48], db, coordmode)
+            continue
+        for j in range(18):
+            idx[j] = 0
+        for g in range(db.ngroup):
+            if coordmode:
+                for i in range(db.nslot[g]):
+                    c = state[db.slots[g][i]]
+                    o = state[db.slots[g][i] + db.oriofs[g]]
+                    cub = &batch_cubies[i*RANK_NB]
+                    ori = &batch_oris[i*RANK_NB]
+                    for j in range(18):
+                        cub[j] = c
+                        ori[j] = o
+                # The corners are the first 4 cubies a move changes
+                nlo = 0 if db.base[g] == 0 else 4
+                nhi = nlo + 4
+                for j in range(18):
+                    m = allowed_moves[j]
+                    if m == -1:
+                        continue
+                    dst = cubie_move_dst[m]
+                    src = cubie_move_src[m]
+                    mvori = cubie_move_ori[m]
+                    for n in range(nlo, nhi):
+                        pos = db.nodepos[g][dst[n]]
+                        if pos >= 0:
+                            batch_cubies[pos*RANK_NB + j] = state[src[n]]
+                            if db.base[g] == 0:
+                                batch_oris[pos*RANK_NB + j] = add_mod3[state[src[n] + NODE_CORI] + mvori[n]]
+                            else:
+                                batch_oris[pos*RANK_NB + j] = state[src[n] + NODE_EORI - NODE_EDGE] ^ mvori[n]
+            else:
+                for i in range(db.nslot[g]):
+                    face = db.faces[g][i]
+                    cub = &batch_cubies[i*RANK_NB]
+                    ori = &batch_oris[i*RANK_NB]
+                    for j in range(18):
+                        cub[j] = (newstates[j*48 + face] >> 2) - db.base[g]
+                        ori[j] = newstates[j*48 + face] & 3
+            if batch_avx2:
+                rank_batch_avx2(batch_cubies, batch_oris, db.nslot[g], db.nodig[g], \
+                                db.wdig[g], db.wori[g], batch_ranks)
+            else:
+                rank_batch(batch_cubies, batch_oris, db.nslot[g], db.nodig[g], \
+                           db.wdig[g], db.wori[g], batch_ranks)
+            for j in range(18):
+                idx[j] = idx[j] * db.gsize[g] + batch_ranks[j]
+
+# Index in a LAYOUT_GROUPED database for a lehmer code
+#  corner: perm*2187 + orient becomes
+#    ((perm/24)*81 + orient/27)*648 + (perm%24)*27 + orient%27
+#  12p7 edges: rank*128 + orient becomes
+#    ((rank/336)*16 + orient/8)*2688 + (rank%336)*8 + orient%8
+#  The alledge code has the U face last already and the symmetry reduced
+#  corner code starts with the class so they are left as is
+cdef inline long pdb_grouped_index(int code, long idx):
+    cdef long hi, lo
+    if code == 0:
+        hi = idx // 2187
+        lo = idx % 2187
+        return ((hi // 24) * 81 + lo // 27) * 648 + (hi % 24) * 27 + lo % 27
+    if code == 2 or code == 3 or code == CODE_EDGE1_SYM:
+        hi = idx >> 7
+        lo = idx & 127
+        return ((hi // 336) * 16 + (lo >> 3)) * 2688 + (hi % 336) * 8 + (lo & 7)
+    return idx
+
+# Look up the raw entry for lehmer code idx of a pattern database
+#  This is the distance to solve except for DB_MOD3 where it is
+#  the distance mod 3
+cdef inline int pdb_value(pattern_db* db, long idx):
+    cdef const stdint.uint8_t* data = db.data
+    cdef long blk
+    if db.layout == LAYOUT_GROUPED:
+        idx = pdb_grouped_index(db.code, idx)
+    if not db.cache == NULL:
+        blk = idx // db.cache.chunk
+        data = cache_block(db.cache, blk)
+        idx = idx - blk * db.cache.chunk
+    if db.fmt == DB_NIBBLE:
+        return (data[idx >> 1] >> ((idx & 1) << 2)) & 15
+    if db.fmt == DB_MOD3:
+        return (data[idx >> 2] >> ((idx & 3) << 1)) & 3
+    if db.fmt == DB_NONE:
+        return 0
+    return (<const stdint.int16_t*>data)[idx]
+
+# Start loading the byte pdb_value reads for lehmer code idx. The entries
+#  of a BlockCacheDB are only in memory once their block is decompressed
+#  so those are not prefetched
+cdef inline void pdb_prefetch(pattern_db* db, long idx):
+    if db.fmt == DB_NONE or not db.cache == NULL:
+        return
+    if db.layout == LAYOUT_GROUPED:
+        idx = pdb_grouped_index(db.code, idx)
+    if db.fmt == DB_NIBBLE:
+        prefetch_line(&db.data[idx >> 1])
+    elif db.fmt == DB_MOD3:
+        prefetch_line(&db.data[idx >> 2])
+    else:
+        prefetch_line(&db.data[idx << 1])
+
+# Prefetch the entries of all the allowed children in all the databases
+#  (indices from rank_children). Every child of a node is looked up so
+#  issuing all the loads before the first one is read overlaps their
+#  cache and TLB misses instead of waiting for them one at a time
+cdef inline void prefetch_children(pattern_db* pdbs, int ndb, int* allowed_moves, \
+                                   long* childidx):
+    cdef int k, j
+    for j in range(18):
+        if not allowed_moves[j] == -1:
+            for k in range(ndb):
+                pdb_prefetch(&pdbs[k], childidx[k*18 + j])
+
+# Distance to solve for entry idx of a pattern database given the
+#  distance of the parent configuration one move away.
+#  In a consistent database the child is at parent-1, parent or parent+1
+#  and those are all different mod 3, so the mod 3 value picks one.
+cdef inline int pdb_child_value(pattern_db* db, long idx, int parent):
+    cdef int d
+    d = pdb_value(db, idx)
+    if db.fmt == DB_MOD3:
+        d = (d - parent % 3 + 3) % 3
+        if d == 2:
+            return parent - 1
+        return parent + d
+    return d
+
+# Distance to solve of database db for a cube configuration that does
+#  not have a parent to rebuild it from (the start of a search)
+#  For a mod 3 database walk towards solved always taking the move to a
+#  neighbor whose distance is one less. Every configuration except solved
+#  has such a neighbor unless it is past the depth that the database
+#  generator searched. Those configurations are all stamped with maxval.
+cdef int pdb_start_value(stdint.uint8_t* fc, pattern_db* db):
+    cdef stdint.uint8_t[18][48] newmoves
+    cdef stdint.uint8_t[48] curfc
+    cdef long idx
+    cdef int steps, wantmod, found
+    cdef Py_ssize_t k
+    idx = pdb_index(fc, db)
+    if not db.fmt == DB_MOD3:
+        return pdb_value(db, idx)
+    memcpy(curfc, fc, 48)
+    steps = 0
+    while not idx == db.solved:
+        wantmod = (pdb_value(db, idx) + 2) % 3
+        move_with_cython(curfc, <stdint.uint8_t*>newmoves, all_moves)
+        found = 0
+        for k in range(18):
+            idx = pdb_index(<stdint.uint8_t*>&(newmoves[k]), db)
+            if pdb_value(db, idx) == wantmod:
+                memcpy(curfc, &(newmoves[k]), 48)
+                found = 1
+                break
+        if not found:
+            return steps + db.maxval
+        steps = steps + 1
+    return steps
+
+# Pattern database kept compressed in memory with an LRU cache of
+#  decompressed blocks. Pass it to DFS_cython_solve in place of the
+#  database buffer. Every process has its own cache and counters
+# INPUT
+# comp - uint8 buffer of the compressed blocks
+# offsets - int64 start of each block in comp and the end of the last one
+# n, fmt - number of entries and storage format
+# chunk - entries per block
+# nslots - number of decompressed blocks to keep
+cdef class BlockCacheDB:
+    cdef block_cache c
+    cdef readonly int fmt
+    cdef readonly long n
+    cdef object comp_view, offsets_view
+
+    def __cinit__(self, comp, offsets, long n, int fmt, long chunk, int nslots):
+        cdef const stdint.uint8_t[::1] compv = numpy.frombuffer(comp, dtype=numpy.uint8)
+        cdef const stdint.int64_t[::1] offv = numpy.ascontiguousarray(offsets, dtype=numpy.int64)
+        cdef Py_ssize_t i
+        cdef long nent, nbytes
+        cdef unsigned long destlen
+        cdef stdint.uint8_t[::1] tmpv
+        if nslots < 1:
+            raise ValueError('Need at least one cache slot')
+        self.comp_view = compv
+        self.offsets_view = offv
+        self.fmt = fmt
+        self.n = n
+        self.c.comp = &compv[0]
+        self.c.offsets = &offv[0]
+        self.c.nblocks = offv.shape[0] - 1
+        self.c.chunk = chunk
+        if fmt == DB_NIBBLE:
+            self.c.blockbytes = (chunk + 1) // 2
+        elif fmt == DB_MOD3:
+            self.c.blockbytes = (chunk + 3) // 4
+        else:
+            self.c.blockbytes = chunk * 2
+        # Decompress every block once so a corrupt or truncated file fails
+        #  here instead of giving wrong distances in the search
+        if chunk < 1 or not self.c.nblocks == (n + chunk - 1) // chunk:
+            raise ValueError('The compressed database does not have a block for every chunk')
+        tmpv = numpy.zeros((self.c.blockbytes,), dtype=numpy.uint8)
+        for i in range(self.c.nblocks):
+            nent = min(chunk, n - i * chunk)
+            if fmt == DB_NIBBLE:
+                nbytes = (nent + 1) // 2
+            elif fmt == DB_MOD3:
+                nbytes = (nent + 3) // 4
+            else:
+                nbytes = nent * 2
+            destlen = self.c.blockbytes
+            if nent <= 0 or offv[i+1] < offv[i] or offv[i+1] > compv.shape[0] or \
+                    not uncompress(&tmpv[0], &destlen, &compv[0] + offv[i], \
+                                   offv[i+1] - offv[i]) == Z_OK or \
+                    not destlen == nbytes:
+                raise ValueError('Block {0:d} of the compressed database is corrupt'.format(i))
+        self.c.nslots = min(nslots, self.c.nblocks)
+        self.c.slots = <stdint.uint8_t*>lib.malloc(self.c.nslots * self.c.blockbytes)
+        self.c.slot_block = <int*>lib.malloc(self.c.nslots * sizeof(int))
+        self.c.slot_prev = <int*>lib.malloc(self.c.nslots * sizeof(int))
+        self.c.slot_next = <int*>lib.malloc(self.c.nslots * sizeof(int))
+        self.c.block_slot = <int*>lib.malloc(self.c.nblocks * sizeof(int))
+        if self.c.slots == NULL or self.c.slot_block == NULL or self.c.slot_prev == NULL \
+                or self.c.slot_next == NULL or self.c.block_slot == NULL:
+            raise MemoryError()
+        for i in range(self.c.nslots):
+            self.c.slot_block[i] = -1
+            self.c.slot_prev[i] = i - 1
+            self.c.slot_next[i] = i + 1
+        self.c.slot_next[self.c.nslots-1] = -1
+        self.c.head = 0
+        self.c.tail = self.c.nslots - 1
+        for i in range(self.c.nblocks):
+            self.c.block_slot[i] = -1
+        self.c.hits = 0
+        self.c.misses = 0
+        self.c.errors = 0
+
+    def __dealloc__(self):
+        lib.free(self.c.slots)
+        lib.free(self.c.slot_block)
+        lib.free(self.c.slot_prev)
+        lib.free(self.c.slot_next)
+        lib.free(self.c.block_slot)
+
+    @property
+    def hits(self):
+        return self.c.hits
+
+    @property
+    def misses(self):
+        return self.c.misses
+
+    @property
+    def errors(self):
+        return self.c.errors
+
+    @property
+    def cache_bytes(self):
+        return self.c.nslots * self.c.blockbytes
+
+    def reset_counters(self):
+        self.c.hits = 0
+        self.c.misses = 0
+        self.c.errors = 0
+
+# Faces, first cubie, number of cubies and orientations kept of the
+#  lehmer codes that are ranked as a group of cubies
+cdef dict code_groups = {0:[(corner_p_idx, 0, 8, 3)], 1:[(edge_p_idx, 8, 12, 1)], \
+                         2:[(edge1_p_idx, 8, 12, 2)], 3:[(edge2_p_idx, 8, 12, 2)]}
+
+# Fill in the ranking groups of a database from a spec
+#  (corner_faces, corner_nori, edge_faces, edge_nori as saved in the npz
+#  files of rubik_cube_fast_dbgen.py) or from the lehmer code
+cdef set_pattern_db_groups(pattern_db* db, spec):
+    cdef Py_ssize_t g, i
+    cdef long w
+    if spec is not None:
+        groups = []
+        if len(spec['corner_faces']) > 0:
+            groups.append((spec['corner_faces'], 0, 8, int(spec['corner_nori'])))
+        if len(spec['edge_faces']) > 0:
+            groups.append((spec['edge_faces'], 8, 12, int(spec['edge_nori'])))
+        if len(groups) == 0:
+            raise ValueError('A database spec needs corner or edge faces')
+    else:
+        groups = code_groups.get(db.code, [])
+    db.ngroup = len(groups)
+    refs = [corner_p_idx[i] for i in range(8)] + [edge_p_idx[i] for i in range(12)]
+    for g, (faces, base, ncubie, nori) in enumerate(groups):
+        if len(faces) > ncubie:
+            raise ValueError('More faces than cubies in a database spec')
+        db.nslot[g] = len(faces)
+        db.ncubie[g] = ncubie
+        db.nori[g] = nori
+        db.base[g] = base
+        db.oriofs[g] = NODE_CORI if base == 0 else NODE_EORI - NODE_EDGE
+        for i in range(len(faces)):
+            db.faces[g][i] = faces[i]
+            db.slots[g][i] = -1
+            if faces[i] in refs:
+                db.slots[g][i] = refs.index(faces[i]) + (0 if base == 0 else NODE_EDGE - 8)
+        db.nodig[g] = 0
+        if nori > 1:
+            db.nodig[g] = len(faces) - 1 if len(faces) == ncubie else len(faces)
+        db.gsize[g] = 1
+        for i in range(db.nslot[g]):
+            db.gsize[g] = db.gsize[g] * (ncubie - i)
+        for i in range(db.nodig[g]):
+            db.gsize[g] = db.gsize[g] * nori
+    db.batch = 1
+    for g in range(db.ngroup):
+        if db.gsize[g] > 0xFFFFFFFF or db.nslot[g] > BATCHMAXSLOT:
+            db.batch = 0
+            continue
+        w = 1
+        for i in range(db.nodig[g] - 1, -1, -1):
+            db.wori[g][i] = w
+            w = w * db.nori[g]
+        for i in range(db.nslot[g] - 1, -1, -1):
+            db.wdig[g][i] = w
+            w = w * (db.ncubie[g] - i)
+        for i in range(NODEBYTES):
+            db.nodepos[g][i] = -1
+        for i in range(db.nslot[g]):
+            if db.slots[g][i] >= 0:
+                db.nodepos[g][db.slots[g][i]] = i
+    db.cornercoord = 0
+    if db.ngroup == 1 and db.base[0] == 0 and db.nslot[0] == 8 and db.nori[0] == 3:
+        db.cornercoord = 1
+        for i in range(8):
+            if not db.slots[0][i] == i:
+                db.cornercoord = 0
+
+# Every database of a search over cubie nodes needs to be ranked from the
+#  corner_p_idx and edge_p_idx faces
+cdef check_coord_dbs(pattern_db* pdbs, int ndb):
+    cdef Py_ssize_t k, g, i
+    for k in range(ndb):
+        if pdbs[k].ngroup == 0:
+            raise ValueError('The symmetry codes need the faceids. Use coordmoves=0')
+        for g in range(pdbs[k].ngroup):
+            for i in range(pdbs[k].nslot[g]):
+                if pdbs[k].slots[g][i] < 0:
+                    raise ValueError('Face {0:d} of a database spec is not one of the cubie node faces. Use coordmoves=0'.format(pdbs[k].faces[g][i]))
+
+# Fill in pdbs from the python side database buffers
+#  dbs is a list of up to MAXDB databases and the other inputs are the
+#  same length lists (or None for the defaults) see DFS_cython_solve
+#  Returns the byte views of the buffers. The caller needs to hold on to
+#  them for as long as pdbs is in use
+cdef list setup_pattern_dbs(pattern_db* pdbs, dbs, dbfmts, dbmaxvals, dbcodes, dblayouts, \
+                            dbspecs):
+    cdef const stdint.uint8_t[::1] dbbytes
+    cdef Py_ssize_t i, g
+    if len(dbs) < 1 or len(dbs) > MAXDB:
+        raise ValueError('Between 1 and {0:d} pattern databases can be used'.format(MAXDB))
+    views = []
+    for i in range(len(dbs)):
+        pdbs[i].fmt = DB_INT16
+        if dbfmts is not None:
+            pdbs[i].fmt = dbfmts[i]
+        if pdbs[i].fmt < DB_INT16 or pdbs[i].fmt > DB_NONE:
+            raise ValueError('Unknown storage format {0:d}'.format(pdbs[i].fmt))
+        pdbs[i].cache = NULL
+        if dbs[i] is None or pdbs[i].fmt == DB_NONE:
+            # Database left out of the search
+            views.append(None)
+            pdbs[i].data = NULL
+            pdbs[i].fmt = DB_NONE
+        elif isinstance(dbs[i], BlockCacheDB):
+            if not (<BlockCacheDB>dbs[i]).fmt == pdbs[i].fmt:
+                raise ValueError('Block compressed database is not in the format given')
+            views.append(dbs[i])
+            pdbs[i].data = NULL
+            pdbs[i].cache = &(<BlockCacheDB>dbs[i]).c
+        else:
+            # View each database as raw bytes regardless of how it is stored
+            dbbytes = numpy.frombuffer(dbs[i], dtype=numpy.uint8)
+            views.append(dbbytes)
+            pdbs[i].data = &dbbytes[0]
+        pdbs[i].maxval = -1
+        if dbmaxvals is not None:
+            pdbs[i].maxval = dbmaxvals[i]
+        if pdbs[i].fmt == DB_MOD3 and pdbs[i].maxval < 0:
+            raise ValueError('A DB_MOD3 pattern database needs its maximum value')
+        pdbs[i].code = i if i < 4 else CODE_SPEC
+        if dbcodes is not None:
+            pdbs[i].code = dbcodes[i]
+        if pdbs[i].code < 0 or pdbs[i].code > CODE_SPEC:
+            raise ValueError('Unknown lehmer code {0:d}'.format(pdbs[i].code))
+        if pdbs[i].code == CODE_CORNER_SYM and not corner_sym_on:
+            raise ValueError('Call set_corner_symmetry before using the symmetry reduced corner database')
+        if pdbs[i].code == CODE_EDGE1_SYM and not edge1_sym_on:
+            raise ValueError('Call set_edge1_symmetry before using the conjugated edge1 code')
+        spec = None
+        if dbspecs is not None:
+            spec = dbspecs[i]
+        if pdbs[i].code == CODE_SPEC and spec is None:
+            raise ValueError('A CODE_SPEC pattern database needs its spec')
+        set_pattern_db_groups(&pdbs[i], spec if pdbs[i].code == CODE_SPEC else None)
+        pdbs[i].consistent = pdbs[i].code == CODE_CORNER_SYM or pdbs[i].ngroup > 0
+        for g in range(pdbs[i].ngroup):
+            if pdbs[i].nslot[g] < pdbs[i].ncubie[g]:
+                pdbs[i].consistent = 0
+        pdbs[i].layout = LAYOUT_STD
+        if dblayouts is not None:
+            pdbs[i].layout = dblayouts[i]
+        if pdbs[i].layout == LAYOUT_GROUPED and pdbs[i].code == CODE_SPEC:
+            raise ValueError('LAYOUT_GROUPED is only for the lehmer code databases')
+        pdbs[i].solved = pdb_index(solved_faces, &pdbs[i])
+    return views
+
+# Copy the conjugation tables from rubik_cube_symmetry.conjugation_tables()
+cdef copy_symmetry_tables(src, relabel):
+    cdef Py_ssize_t s, i
+    for s in range(48):
+        for i in range(48):
+            sym_src[s][i] = src[s][i]
+        for i in range(128):
+            sym_relabel[s][i] = relabel[s][i]
+
+# Fill in the tables for the symmetry reduced corner code
+#  The inputs come from rubik_cube_symmetry.py
+# INPUT
+# src, relabel - conjugation_tables() 48x48 and 48x128
+# perm_class, perm_sym - corner_perm_classes() for the 40320 permutations
+def set_corner_symmetry(src, relabel, perm_class, perm_sym):
+    global corner_sym_on
+    cdef Py_ssize_t i
+    copy_symmetry_tables(src, relabel)
+    for i in range(40320):
+        corner_sym_class[i] = perm_class[i]
+        corner_sym_sym[i] = perm_sym[i]
+    corner_sym_on = 1
+
+# Turn on the conjugated edge1 code so the edge1 database can also
+#  serve the symmetric image of the edge1 set of edges
+# INPUT
+# src, relabel - conjugation_tables() 48x48 and 48x128
+# s - the symmetry to conjugate by rubik_cube_symmetry.edge1_image_symmetry()
+def set_edge1_symmetry(src, relabel, int s):
+    global edge1_sym, edge1_sym_on
+    copy_symmetry_tables(src, relabel)
+    edge1_sym = s
+    edge1_sym_on = 1
+
+# Raise if a BlockCacheDB block did not decompress in this process
+cdef int check_block_errors(pattern_db* pdbs, int ndb) except -1:
+    cdef int k
+    for k in range(ndb):
+        if not pdbs[k].cache == NULL and pdbs[k].cache.errors > 0:
+            raise RuntimeError('{0:d} blocks of compressed database {1:d} did not decompress'.format( \
+                               pdbs[k].cache.errors, k))
+    return 0
+
+# Distance to solve from each of the pattern databases for the cube
+#  configuration fc. Inputs are the same as in DFS_cython_solve
+def pattern_db_scores(bytes fc, dbs, dbfmts=None, dbmaxvals=None, dbcodes=None, \
+                      dblayouts=None, dbspecs=None):
+    cdef pattern_db pdbs[MAXDB]
+    cdef stdint.uint8_t[48] tmpfc
+    cdef Py_ssize_t i
+    views = setup_pattern_dbs(pdbs, dbs, dbfmts, dbmaxvals, dbcodes, dblayouts, dbspecs)
+    for i in range(48):
+        tmpfc[i] = fc[i]
+    scores = [pdb_start_value(tmpfc, &pdbs[i]) for i in range(len(dbs))]
+    check_block_errors(pdbs, len(dbs))
+    return scores
+
+# Children pruned by each database (its position in dbs) in the
+#  DFS_cython_solve calls of this process. A child counts for the first
+#  database in the lookup order whose distance prunes it
+cdef long[MAXDB] db_cutoffs
+# Lookups of each database skipped with the parent bounds
+cdef long[MAXDB] db_skipped
+# Children pruned by the dual lookup of each database and by bpmx
+cdef long[MAXDB] db_dual_cutoffs
+cdef long bpmx_cutoffs = 0
+
+# OUTPUT - list of the children pruned by each database position
+def db_cutoff_counts():
+    return [db_cutoffs[i] for i in range(MAXDB)]
+
+# OUTPUT - list of the lookups skipped for each database position
+def db_skip_counts():
+    return [db_skipped[i] for i in range(MAXDB)]
+
+# OUTPUT - list of the children pruned by the dual lookup of each
+#  database position, children pruned by bpmx
+def dual_cutoff_counts():
+    return [db_dual_cutoffs[i] for i in range(MAXDB)], bpmx_cutoffs
+
+# Zero db_cutoff_counts, db_skip_counts and dual_cutoff_counts
+def reset_db_cutoffs():
+    global bpmx_cutoffs
+    memset(db_cutoffs, 0, sizeof(db_cutoffs))
+    memset(db_skipped, 0, sizeof(db_skipped))
+    memset(db_dual_cutoffs, 0, sizeof(db_dual_cutoffs))
+    bpmx_cutoffs = 0
 
 # Main entry point for performing DFS search from the initial face configuration
 # up to maxlev for the search
@@ -282,11 +1400,59 @@ cdef void lehmer_code_faces(stdint.uint8_t* fc, int* finalstates):
 # maxlev - stop search at this level
 # strtlev - commence search at this level
 # strtmv - last move that lead to the input fc cube configuration
-# corner, alledge, edge1, edge2 - reference to the pattern databases
-#  that provide the number of moves needed to solve the given sub configuration
+# dbs - list of the pattern databases (1 to MAXDB of them) that provide
+#  the number of moves needed to solve the given sub configuration.
+#  The heuristic is the max over them. Usually corner, alledge, edge1, edge2
+#  Any object with the buffer interface works (numpy array, RawArray)
+#  or a BlockCacheDB. None leaves that database out of the search
+#  The other inputs are lists the same length as dbs
+# dbfmts - storage format of each database
+#  (DB_INT16, DB_NIBBLE, DB_MOD3 or DB_NONE for one that is not loaded).
+#  Default is DB_INT16
+# dbmaxvals - largest distance in each database. Only
+#  needed for DB_MOD3 databases
+# dbcodes - which lehmer code indexes each database. Default
+#  is (0, 1, 2, 3) then CODE_SPEC. Use CODE_CORNER_SYM (4) in place of 0
+#  for the symmetry reduced corner database and CODE_EDGE1_SYM (5) with
+#  the edge1 database to look up the symmetric image of
+#  the edge1 edges. CODE_SPEC (6) for a database of any other set of
+#  cubies made by rubik_cube_fast_dbgen.py
+# dblayouts - index layout of each database (LAYOUT_STD or
+#  LAYOUT_GROUPED). Default is LAYOUT_STD
+# dbspecs - spec of each CODE_SPEC database (None for the others)
+#  a dict with the corner_faces, corner_nori, edge_faces, edge_nori saved
+#  next to the table, see rubik_pattern_db.load_npz_spec
+# coordmoves - 1 to search over cubie nodes (see move_cubies) instead of
+#  the 48 faceids. The corner code comes from move tables and the others
+#  from the cubie bytes so nothing is gathered from the faces. Not for the
+#  symmetry codes or specs with faces outside corner_p_idx and edge_p_idx
+# prefetch - 1 to prefetch the database entries of all the children of a
+#  configuration before reading any of them (see prefetch_children)
+# dborder - positions in dbs in the order the databases are looked up.
+#  Default is the order of dbs. A child is pruned by the first database
+#  whose distance is too large for the levels left and the rest are not
+#  looked up, so the ones that prune the most (see db_cutoff_counts) or
+#  are the cheapest to look up go first
+# parentbounds - 1 to skip the lookups a consistent database does not need.
+#  Its children are within 1 of the parent so when the parent bounds
+#  already say whether they are pruned they are not looked up and carry
+#  the parent bounds widened by 1 instead (see db_skip_counts)
+# dual - 1 to also look up the databases for the inverse of each child
+#  that the databases did not prune (see inverse_faces). Only the
+#  databases of some of the cubies of a set (12p7 edges) differ for the
+#  inverse. Not for DB_MOD3 databases, the dual distance of a child is not
+#  within 1 of the parent
+# bpmx - 1 for bidirectional pathmax. With the dual lookups and the 12p7
+#  edge databases a child can be more than 1 above its parent, then the
+#  parent is at least that - 1 and its other children that - 2. When
+#  that is out of budget every child is pruned, otherwise the children
+#  keep it as their heuristic
 # OUTPUT - retval == 2 if solution found ; 0 if not
-def DFS_cython_solve(bytes fc, int maxlev, int strtlev, int strtmv, DTYPE_t [:] corner, \
-                     DTYPE_t [:] alledge, DTYPE_t [:] edge1, DTYPE_t [:] edge2):
+def DFS_cython_solve(bytes fc, int maxlev, int strtlev, int strtmv, dbs, \
+                     dbfmts=None, dbmaxvals=None, dbcodes=None, dblayouts=None, \
+                     dbspecs=None, int coordmoves=0, int prefetch=1, dborder=None, \
+                     int parentbounds=1, int dual=0, int bpmx=0):
+    global bpmx_cutoffs
     
     cdef int MAXLEVEL # max level searched
     cdef int MAXBUFF # The DFS stack is maintained in a 2D array
@@ -330,15 +1496,66 @@ def DFS_cython_solve(bytes fc, int maxlev, int strtlev, int strtmv, DTYPE_t [:]
         #  room to store a history up to 20 moves
     cdef int[23] tmpdat # temp storage for auxillary data
     cdef int* dpt # pointer to auxillary data
+    cdef int[1000][MAXDB] buffdist # Also in parallel with the faceid buffer
+        # the exact distance from each pattern database. The DB_MOD3
+        # databases need the parent distance to get the child distance
+    cdef int[1000][MAXDB] buffdhi # and an upper bound on it. The two are
+        # the same unless the lookup was skipped (see parentbounds) and
+        # then buffdist is a lower bound
+    cdef int[MAXDB] tmpdist # distances of the configuration being expanded
+    cdef int[MAXDB] tmpdhi
+    cdef int[MAXDB] childdist # distances of a child configuration
+    cdef int[MAXDB] childdhi
+    cdef long[MAXDB*18] childidx # database indices of all the children
+    cdef int[18][MAXDB] kiddist # distances of all the children
+    cdef int[18][MAXDB] kiddhi
+    cdef int[18] alive # allowed moves whose child is not pruned yet (-1)
+    cdef int[MAXDB] order # lookup order of the databases
+    cdef int[MAXDB] look # the databases that need to be looked up
+    cdef int[MAXDB] usebounds # skip lookups with the parent bounds
+    cdef int budget, o, nlook, nalive
+    cdef stdint.uint8_t[1000][48] buffinv # faceids of the inverse cube
+    cdef int[1000] buffh # heuristic with the dual lookups and bpmx
+    cdef stdint.uint8_t[48] tmpinv
+    cdef stdint.uint8_t[18][48] kidinv
+    cdef int[18] kidh # largest distance found for each child
+    cdef long[18] dualidx
+    cdef int[MAXDB] usedual
+    cdef int hpar, d
     
     cdef int lastMove, curLevel, cmv, turn1level
     cdef long totCnt # keep track of total # of moves
     cdef int notSolved, notEmpty
     cdef Py_ssize_t i, k, kk
     cdef int highn # keep track of largest buffer fill encountered
-    cdef int lehcode[4] # keep lehmer codes
-    cdef int score, tmpscore, start_dist, cs, ce, ce1, ce2 # scores/ distance
+    cdef int score, tmpscore, start_dist # scores/ distance
         # to solving for the pattern databases
+    cdef pattern_db pdbs[MAXDB] # usually corner, alledge, edge1, edge2
+    cdef int ndb = len(dbs)
+    cdef const stdint.uint8_t* solvedp = solved_faces # solved configuration
+    cdef int nstate = 48 # and the bytes of it to compare
+    # dbviews keeps the database buffers alive during the search
+    dbviews = setup_pattern_dbs(pdbs, dbs, dbfmts, dbmaxvals, dbcodes, dblayouts, dbspecs)
+    if dborder is None:
+        dborder = range(ndb)
+    if not sorted(dborder) == list(range(ndb)):
+        raise ValueError('dborder needs each database position once')
+    for k in range(ndb):
+        order[k] = dborder[k]
+        # The mod 3 databases need the exact parent distance
+        usebounds[k] = parentbounds and pdbs[k].consistent and \
+                       not (pdbs[k].fmt == DB_MOD3 or pdbs[k].fmt == DB_NONE)
+        # A database of whole cubie sets gives the inverse the same value
+        usedual[k] = dual and not pdbs[k].consistent and \
+                     not (pdbs[k].fmt == DB_MOD3 or pdbs[k].fmt == DB_NONE)
+    if dual and not dual_tables_on:
+        init_dual_tables()
+    if coordmoves:
+        check_coord_dbs(pdbs, ndb)
+        if not coord_tables_on:
+            init_coord_tables()
+        solvedp = solved_node
+        nstate = NODEBYTES
     curLevel = strtlev
     lastMove = strtmv
     # copy the original input face vector into the c variables
@@ -374,6 +1591,15 @@ def DFS_cython_solve(bytes fc, int maxlev, int strtlev, int strtmv, DTYPE_t [:]
 #    start_dist = score
     #print('Starting Distance: {0:d}'.format(start_dist))
     MAXLEVEL = maxlev
+    # Exact distances of the starting configuration
+    for k in range(ndb):
+        tmpdist[k] = pdb_start_value(tmpfc, &pdbs[k])
+        tmpdhi[k] = tmpdist[k]
+    if dual:
+        inverse_faces(tmpfc, tmpinv)
+    if coordmoves:
+        faces_to_node(tmpfc, <stdint.uint8_t*>newmoves)
+        memcpy(tmpfc, newmoves, 48)
     
     # Do the initial filling of buff moves and buffdata with the first moves
     bp = -1
@@ -381,24 +1607,34 @@ def DFS_cython_solve(bytes fc, int maxlev, int strtlev, int strtmv, DTYPE_t [:]
     totCnt = 0
     highn = 0
     # Perform the first set of moves
-    move_with_cython(tmpfc, <stdint.uint8_t*>newmoves, ignore_moves[lastMove])
+    move_state(tmpfc, <stdint.uint8_t*>newmoves, ignore_moves[lastMove], coordmoves)
+    rank_children(tmpfc, <stdint.uint8_t*>newmoves, ignore_moves[lastMove], pdbs, ndb, coordmoves, childidx)
+    if prefetch:
+        prefetch_children(pdbs, ndb, ignore_moves[lastMove], childidx)
     for i in range(18):
         cmv = ignore_moves[lastMove][i] 
         if not cmv == -1: # This ignores the redundant moves
             # Get Score of this configuration
             mvp = <stdint.uint8_t*>&(newmoves[i])
-            lehmer_code_faces(mvp, lehcode)
             # score is the maximum among all the databases
-            score = corner[lehcode[0]]
-            tmpscore = alledge[lehcode[1]]
-            if tmpscore > score:
-                score = tmpscore
-            tmpscore = edge1[lehcode[2]]
-            if tmpscore > score:
-                score = tmpscore
-            tmpscore = edge2[lehcode[3]]
-            if tmpscore > score:
-                score = tmpscore
+            score = 0
+            for k in range(ndb):
+                childdist[k] = pdb_child_value(&pdbs[k], childidx[k*18 + i], tmpdist[k])
+                if childdist[k] > score:
+                    score = childdist[k]
+            # Dual lookups as for the deeper children
+            if dual and score <= MAXLEVEL:
+                move_inverse(tmpinv, cmv, kidinv[i])
+                for o in range(ndb):
+                    k = order[o]
+                    if not usedual[k]:
+                        continue
+                    d = pdb_value(&pdbs[k], pdb_index(kidinv[i], &pdbs[k]))
+                    if d > score:
+                        score = d
+                        if score > MAXLEVEL:
+                            db_dual_cutoffs[k] = db_dual_cutoffs[k] + 1
+                            break
             if score <= MAXLEVEL: # This is the pruning by score step
                    # if there is too many steps needed for the max number
                    # allowed we can prune this configure
@@ -411,6 +1647,11 @@ def DFS_cython_solve(bytes fc, int maxlev, int strtlev, int strtmv, DTYPE_t [:]
                 tmpdat[curLevel +1] = cmv
                 dpt = <int*>&(buffdata[bp]) # pointer to aux data buffer
                 memcpy(dpt, tmpdat, sizeof(int)*23) # copy aux data over
+                memcpy(&(buffdist[bp]), childdist, sizeof(int)*ndb)
+                memcpy(&(buffdhi[bp]), childdist, sizeof(int)*ndb)
+                buffh[bp] = score
+                if dual:
+                    memcpy(buffinv[bp], kidinv[i], 48)
 
     # DEBUG to confirm that the first moves are correct
 #    facecodechars = ["c012","e051","c051","e091","c062","e061","c021","e011",\
@@ -427,7 +1668,8 @@ def DFS_cython_solve(bytes fc, int maxlev, int strtlev, int strtmv, DTYPE_t [:]
  
     # Keep iterating over the DFS stack
     notSolved = 1
-    notEmpty = 1
+    # Every first move can be pruned when maxlev is below the start distance
+    notEmpty = 1 if bp >= 0 else 0
     frstpass = 0
     while notSolved and notEmpty:
         curLevel = buffdata[bp][0]
@@ -436,33 +1678,136 @@ def DFS_cython_solve(bytes fc, int maxlev, int strtlev, int strtmv, DTYPE_t [:]
             memcpy(tmpfc, bpt, 48)
             lastMove = buffdata[bp][1]
             # perform all allowed moves
-            move_with_cython(tmpfc, <stdint.uint8_t*>newmoves, ignore_moves[lastMove])
+            move_state(tmpfc, <stdint.uint8_t*>newmoves, ignore_moves[lastMove], coordmoves)
             dpt = <int*>&(buffdata[bp]) # copy aux data to temp storage
             memcpy(tmpdat, dpt, sizeof(int)*23)
+            memcpy(tmpdist, &(buffdist[bp]), sizeof(int)*ndb)
+            memcpy(tmpdhi, &(buffdhi[bp]), sizeof(int)*ndb)
+            hpar = buffh[bp]
+            if dual:
+                memcpy(tmpinv, buffinv[bp], 48)
             bp = bp - 1 # pop the move off just by decrementing head location
 
+            # Look up one database at a time for the children not pruned
+            #  yet. A child is pruned as soon as one distance leaves no
+            #  room for it in the levels left (score+curLevel < MAXLEVEL
+            #  below), the other databases are not ranked or read for it.
+            #  The solved cube is 0 in every database so it is never pruned
+            memcpy(alive, ignore_moves[lastMove], sizeof(int)*18)
+            budget = MAXLEVEL - curLevel
+            for i in range(18):
+                kidh[i] = 0
+            # A consistent database whose children are all within budget
+            #  (parent upper bound + 1 < budget) or all out of it (lower
+            #  bound - 1 >= budget) is decided without a lookup. A database
+            #  left out (DB_NONE) is always 0 and costs nothing
+            nlook = 0
+            for o in range(ndb):
+                k = order[o]
+                if pdbs[k].fmt == DB_NONE:
+                    for i in range(18):
+                        kiddist[i][k] = 0
+                        kiddhi[i][k] = 0
+                elif usebounds[k] and tmpdhi[k] + 1 < budget:
+                    nalive = 0
+                    for i in range(18):
+                        kiddist[i][k] = tmpdist[k] - 1
+                        kiddhi[i][k] = tmpdhi[k] + 1
+                        if not alive[i] == -1:
+                            nalive = nalive + 1
+                            if kiddist[i][k] > kidh[i]:
+                                kidh[i] = kiddist[i][k]
+                    db_skipped[k] = db_skipped[k] + nalive
+                elif usebounds[k] and tmpdist[k] - 1 >= budget:
+                    for i in range(18):
+                        if not alive[i] == -1:
+                            kidh[i] = tmpdist[k] - 1
+                            alive[i] = -1
+                            db_cutoffs[k] = db_cutoffs[k] + 1
+                            db_skipped[k] = db_skipped[k] + 1
+                else:
+                    look[nlook] = k
+                    nlook = nlook + 1
+            if nlook > 0:
+                k = look[0]
+                rank_children(tmpfc, <stdint.uint8_t*>newmoves, alive, &pdbs[k], 1, coordmoves, &childidx[k*18])
+                if prefetch:
+                    prefetch_children(&pdbs[k], 1, alive, &childidx[k*18])
+            for o in range(nlook):
+                k = look[o]
+                # rank the children left in the next database and start
+                #  loading their entries before reading this one
+                if o + 1 < nlook:
+                    kk = look[o+1]
+                    rank_children(tmpfc, <stdint.uint8_t*>newmoves, alive, &pdbs[kk], 1, coordmoves, &childidx[kk*18])
+                    if prefetch:
+                        prefetch_children(&pdbs[kk], 1, alive, &childidx[kk*18])
+                for i in range(18):
+                    if not alive[i] == -1:
+                        kiddist[i][k] = pdb_child_value(&pdbs[k], childidx[k*18 + i], tmpdist[k])
+                        kiddhi[i][k] = kiddist[i][k]
+                        if kiddist[i][k] > kidh[i]:
+                            kidh[i] = kiddist[i][k]
+                        if kiddist[i][k] >= budget:
+                            alive[i] = -1
+                            db_cutoffs[k] = db_cutoffs[k] + 1
+
+            # Dual lookups of the children left, in the same order. Their
+            #  indices are all found and prefetched before any is read
+            if dual:
+                for i in range(18):
+                    if not alive[i] == -1:
+                        move_inverse(tmpinv, alive[i], kidinv[i])
+                for o in range(ndb):
+                    k = order[o]
+                    if not usedual[k]:
+                        continue
+                    for i in range(18):
+                        if not alive[i] == -1:
+                            dualidx[i] = pdb_index(kidinv[i], &pdbs[k])
+                            if prefetch:
+                                pdb_prefetch(&pdbs[k], dualidx[i])
+                    for i in range(18):
+                        if not alive[i] == -1:
+                            d = pdb_value(&pdbs[k], dualidx[i])
+                            if d > kidh[i]:
+                                kidh[i] = d
+                            if d >= budget:
+                                alive[i] = -1
+                                db_dual_cutoffs[k] = db_dual_cutoffs[k] + 1
+
+            # Bidirectional pathmax. kidh is a lower bound for every
+            #  child, the pruned ones too, and the parent is at most one
+            #  move from each of them
+            if bpmx:
+                for i in range(18):
+                    if not ignore_moves[lastMove][i] == -1 and kidh[i] - 1 > hpar:
+                        hpar = kidh[i] - 1
+                if hpar > budget:
+                    # No solution within MAXLEVEL through the parent
+                    for i in range(18):
+                        if not alive[i] == -1:
+                            alive[i] = -1
+                            bpmx_cutoffs = bpmx_cutoffs + 1
+
             # go through newmoves and see which ones pass the score test
             for i in range(18):
-                cmv = ignore_moves[lastMove][i]
+                cmv = alive[i]
                 if not cmv == -1:
                     # Get Score of this configuration
                     mvp = <stdint.uint8_t*>&(newmoves[i])
-                    # get distance to end from databases
-                    lehmer_code_faces(mvp, lehcode)
-                    score = corner[lehcode[0]]
-                    cs = score
-                    ce = alledge[lehcode[1]]
-                    if ce > score:
-                        score = ce
-                    ce1 = edge1[lehcode[2]]
-                    if ce1 > score:
-                        score = ce1
-                    ce2 = edge2[lehcode[3]]
-                    if ce2 > score:
-                        score = ce2
+                    # distance to end from databases (the lower bound of
+                    #  the skipped ones is always within budget)
+                    score = 0
+                    for k in range(ndb):
+                        childdist[k] = kiddist[i][k]
+                        childdhi[k] = kiddhi[i][k]
+                        if childdist[k] > score:
+                            score = childdist[k]
                     # Look to see if this solves cube
-                    if lehcode[0] == 87913026 and lehcode[1] == 439084673 and lehcode[2] == 463509376 and lehcode[3] == 501877120 and curLevel < MAXLEVEL:
+                    if memcmp(mvp, solvedp, nstate) == 0 and curLevel < MAXLEVEL:
                         # Solved!
+                        check_block_errors(pdbs, ndb)
                         #str = ''
                         #for i in range(48):
                         #    str = str + ",{0:d}".format((mvp+i)[0])
@@ -501,7 +1846,7 @@ def DFS_cython_solve(bytes fc, int maxlev, int strtlev, int strtmv, DTYPE_t [:]
                         return 2 # Found solution Bye!
                     # Debug turns 
                     #if tmpdat[2] == 1 and tmpdat[3] == 4 and tmpdat[4] == 13 and tmpdat[5] == 16 and tmpdat[6] == 7 and cmv == 10 and tmpdat[8] == -1 and tmpdat[9] == -1:
-                    #    print(score, curLevel, MAXLEVEL, cs, ce, ce1, ce2)
+                    #    print(score, curLevel, MAXLEVEL, childdist[0], childdist[1], childdist[2], childdist[3])
                     if score+curLevel < MAXLEVEL and curLevel < MAXLEVEL:
                         # This moves passes the score check add it to the stack
                         # along with aux data
@@ -513,6 +1858,13 @@ def DFS_cython_solve(bytes fc, int maxlev, int strtlev, int strtmv, DTYPE_t [:]
                         tmpdat[tmpdat[0] +1] = cmv
                         dpt = <int*>&(buffdata[bp])
                         memcpy(dpt, tmpdat, sizeof(int)*23)
+                        memcpy(&(buffdist[bp]), childdist, sizeof(int)*ndb)
+                        memcpy(&(buffdhi[bp]), childdhi, sizeof(int)*ndb)
+                        buffh[bp] = kidh[i]
+                        if bpmx and hpar - 1 > kidh[i]:
+                            buffh[bp] = hpar - 1
+                        if dual:
+                            memcpy(buffinv[bp], kidinv[i], 48)
     
                         totCnt = totCnt + 1
         else:
@@ -532,6 +1884,95 @@ def DFS_cython_solve(bytes fc, int maxlev, int strtlev, int strtmv, DTYPE_t [:]
     #print("No Solution Found")
     #print("Max Buffer Fill: {0:d}".format(highn))
     #print("Total Moves: {0:d}".format(totCnt))
+    check_block_errors(pdbs, ndb)
     return 0 # no solution found result
             
-            
\ No newline at end of file
+            
+
+# Benchmark for the database lookups the way DFS_cython_solve does them
+#  Walk the cube through moves and at every step look up all 18 children
+#  of the current cube in database db
+# INPUT
+# fc - starting 48 faceids
+# moves - int array of the moves for the walk
+# db, fmt, code, layout - the database, its storage format, lehmer code
+#  and index layout
+# coordmoves - 1 to walk cubie nodes as DFS_cython_solve does with coordmoves
+# batched - 1 to rank the 18 children together as DFS_cython_solve does,
+#  0 to rank them one at a time
+# prefetch - 1 to prefetch the 18 entries before reading them
+# OUTPUT - number of lookups, sum of the looked up values
+def bench_child_lookups(bytes fc, moves, db, int fmt, int code, int layout, \
+                        int coordmoves=0, int batched=1, int prefetch=1):
+    cdef pattern_db pdbs[1]
+    cdef stdint.uint8_t[18][48] newmoves
+    cdef long[18] childidx
+    cdef stdint.uint8_t[48] curfc
+    cdef long[::1] mvs = numpy.ascontiguousarray(moves, dtype=numpy.int_)
+    cdef long nlook, total
+    cdef Py_ssize_t i, k
+    views = setup_pattern_dbs(pdbs, [db], [fmt], [15], [code], [layout], None)
+    for i in range(48):
+        curfc[i] = fc[i]
+    if coordmoves:
+        check_coord_dbs(pdbs, 1)
+        if not coord_tables_on:
+            init_coord_tables()
+        faces_to_node(curfc, <stdint.uint8_t*>newmoves)
+        memcpy(curfc, newmoves, 48)
+    nlook = 0
+    total = 0
+    for i in range(mvs.shape[0]):
+        move_state(curfc, <stdint.uint8_t*>newmoves, all_moves, coordmoves)
+        if batched:
+            rank_children(curfc, <stdint.uint8_t*>newmoves, all_moves, pdbs, 1, coordmoves, childidx)
+        else:
+            for k in range(18):
+                childidx[k] = state_index(<stdint.uint8_t*>&(newmoves[k]), &pdbs[0], coordmoves)
+        if prefetch:
+            prefetch_children(pdbs, 1, all_moves, childidx)
+        for k in range(18):
+            total = total + pdb_value(&pdbs[0], childidx[k])
+        nlook = nlook + 18
+        memcpy(curfc, &(newmoves[mvs[i]]), 48)
+    return nlook, total
+
+# Ranking paths this cpu can run (see lehmer_rank) and the one in use
+# OUTPUT - list of RANK_PATH_NAMES indices, path in use
+def rank_paths():
+    paths = [RANK_TABLE]
+    if rank_features & 1:
+        paths.append(RANK_POPCNT)
+    if rank_features & 3 == 3:
+        paths.append(RANK_PEXT)
+    return paths, rank_path
+
+# Rank with path (RANK_TABLE, RANK_POPCNT or RANK_PEXT) from now on
+#  Each process picks its own so set it before forking the workers
+def set_rank_path(int path):
+    global rank_path
+    if not path in rank_paths()[0]:
+        raise ValueError('Ranking path {0:d} is not supported on this cpu'.format(path))
+    rank_path = path
+
+# Microbenchmark of lehmer_rank
+# INPUT
+# path - ranking path to time
+# cubies - uint8 (n, nslot) rows of distinct cubies 0..ncubie-1
+# ncubie - number of cubies of the kind
+# repeats - times to rank every row
+# OUTPUT - number of ranks, sum of the ranks (to check the paths agree)
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def bench_rank(int path, cubies, int ncubie, long repeats):
+    cdef const stdint.uint8_t[:, ::1] cv = numpy.ascontiguousarray(cubies, dtype=numpy.uint8)
+    cdef Py_ssize_t i, k
+    cdef long total = 0
+    cdef int nslot = cv.shape[1]
+    cdef int oldpath = rank_path
+    set_rank_path(path)
+    for k in range(repeats):
+        for i in range(cv.shape[0]):
+            total = total + lehmer_rank(&cv[i, 0], nslot, ncubie)
+    set_rank_path(oldpath)
+    return cv.shape[0] * repeats, total
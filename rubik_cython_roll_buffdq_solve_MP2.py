@@ -18,12 +18,16 @@ With a precalculated pattern database of minimum length to solve
   Thus, many of these functions have nearly identical surrogates in the 
   cython code as well.
 """
-from multiprocessing import Pool, RawArray, cpu_count
+from multiprocessing import Pool, RawArray, Value, cpu_count
+import os
 import numpy as np
-import rubik_cython_roll_buffdq_solve as rcm
 import rubik_cython_roll_buffdq_solve_MP as rcmMP
 import copy
 import lehmer_code as lc
+import rubik_pattern_db as pdb
+import rubik_cube_symmetry as rcs
+import rubik_db_placement as pl
+import rubik_db_budget as bud
 from collections import deque as dq
 from timeit import default_timer as timer
 
@@ -569,10 +573,9 @@ def child(inarr):
     #print('Starting Move: {0:d}'.format(inarr[0]))
     tmpfc = inarr[3:] # stores the faceids for the cube configuration
     # Get references to the databases that are in shared memory
-    cornerDB = np.frombuffer(patternDB_Storage[0], dtype=np.int16)
-    edgeDB = np.frombuffer(patternDB_Storage[2], dtype=np.int16)
-    edge1DB = np.frombuffer(patternDB_Storage[4], dtype=np.int16)
-    edge2DB = np.frombuffer(patternDB_Storage[6], dtype=np.int16)
+    #  DFS_cython_solve reads the shared buffers directly in whatever
+    #  storage format they are in
+    useDBs = patternDB_Storage[0::2]
     # The maximum level to search
     maxlev_v = inarr[1]
     #  The current level of the search
@@ -590,7 +593,7 @@ def child(inarr):
         usecmv = clev2
     # This is the main worker call to look from a solution from this
     #  cube configuration
-    retval = rcmMP.DFS_cython_solve(bytes(tmpfc), maxlev_v, curlev_v, usecmv, cornerDB, edgeDB, edge1DB, edge2DB)
+    retval = rcmMP.DFS_cython_solve(bytes(tmpfc), maxlev_v, curlev_v, usecmv, useDBs, patternDB_Formats, patternDB_MaxVals, patternDB_Codes, patternDB_Layouts, patternDB_Specs, useCoordMoves, dborder=patternDB_Order, dual=useDualLookups, bpmx=useBPMX)
     # retval == 2 indicates the worker found a solution
     if retval == 2:
         # convert the move integers into character moves
@@ -619,8 +622,39 @@ def child(inarr):
 
     return retval
 
+# Pool initializer when the databases are replicated per NUMA node
+#  Pins the worker to the cpus of a node (round robin over the workers as
+#  they start) and points patternDB_Storage at that node's replica
+def worker_placement(counter):
+    with counter.get_lock():
+        k = counter.value
+        counter.value += 1
+    cpus, storage = patternDB_Replicas[k % len(patternDB_Replicas)]
+    os.sched_setaffinity(0, cpus)
+    patternDB_Storage[:] = storage
+
 # module level pointers for pattern db
 patternDB_Storage=[]
+# (cpus, patternDB_Storage) of each NUMA node replica of the pattern dbs
+patternDB_Replicas=[]
+# storage format of each pattern db see rubik_pattern_db.py
+patternDB_Formats=[]
+# largest distance in each pattern db (needed by the mod3 format)
+patternDB_MaxVals=[]
+# which lehmer code indexes each pattern db
+patternDB_Codes=[]
+# index layout of each pattern db see rubik_pattern_db.py
+patternDB_Layouts=[]
+# spec of each pattern db ranked by its own set of cubies (None for the
+#  lehmer code ones)
+patternDB_Specs=[]
+# 1 to search over cubie nodes, see COORDMOVES
+useCoordMoves = 0
+# positions of the pattern dbs in the order they are looked up, see DBORDER
+patternDB_Order=[]
+# 1 to also look up the inverse cubes, see DUALLOOKUPS and BPMX
+useDualLookups = 0
+useBPMX = 0
 # start time to keep track of elapsed run time
 startts = timer()
 
@@ -640,6 +674,88 @@ if __name__ == '__main__':
     # default is all of them found by multiprocessing.cpu_count()
     print('Found {0:d} CPUS'.format(cpu_count()))
     USENCPUS = cpu_count()
+    # Storage format for each of the pattern databases
+    #  (corner, alledge, edge1, edge2)
+    #  pdb.DB_INT16 - the downloaded databases as int16 ~3.2GB in memory
+    #  pdb.DB_NIBBLE - 4 bits per entry ~0.8GB in memory. Make the packed
+    #     databases first by running rubik_pattern_db.py
+    #  pdb.DB_MOD3 - 2 bits per entry. Only for the corner and alledge
+    #     databases (see pdb.db_consistent). Make them first by running
+    #     rubik_pattern_db.py mod3
+    DBFORMATS = [pdb.DB_INT16, pdb.DB_INT16, pdb.DB_INT16, pdb.DB_INT16]
+    # Which files to read the databases from
+    #  'npz' - the downloaded npz files (int16) or the packed npz files
+    #  'raw' - memory map the raw .bin files instead of loading them into
+    #     shared memory. Startup is near instant and the workers share the
+    #     mapped pages. Make them with rubik_pattern_db.py <format> raw
+    #  'chunked' - decompress the block compressed .pdbz files on all
+    #     cores straight into shared memory. Make them with
+    #     rubik_pattern_db.py <format> chunked
+    #  'blocks' - keep the databases compressed in memory in small blocks.
+    #     Each process decompresses the blocks it needs into an LRU cache
+    #     of BLOCKCACHE_MB per database. Slower search but the smallest
+    #     memory. Make them with rubik_pattern_db.py <format> blocks
+    DBFILES = 'npz'
+    BLOCKCACHE_MB = 64
+    # Use the symmetry reduced corner database (~2M entries instead of ~88M)
+    #  in place of the full corner database. Make it first by running
+    #  rubik_cube_symmetry.py
+    CORNERSYM = False
+    # Drop the edge2 database and look up the edge1 database a second time
+    #  with the cube conjugated by a symmetry. This covers the symmetric
+    #  image of the edge1 edges instead of the edge2 edges and saves the
+    #  memory of one edge database. DBFORMATS[3] is ignored
+    EDGE2FROMEDGE1 = False
+    # Index layout of the corner and 12p7 edge databases
+    #  pdb.LAYOUT_STD - the lehmer code is the index
+    #  pdb.LAYOUT_GROUPED - the U face part of the code is the low part of
+    #     the index so more of the children of a node share a memory page.
+    #     Make the files by adding grouped to rubik_pattern_db.py. The
+    #     int16 npz databases are reordered after loading
+    DBLAYOUT = pdb.LAYOUT_STD
+    # Memory placement of the databases (see rubik_db_placement.py)
+    #  HUGEPAGES - copy the databases into memory backed by huge pages
+    #     pl.HUGE_NONE, pl.HUGE_THP (transparent) or pl.HUGE_TLBFS (explicit,
+    #     reserve them first with sysctl vm.nr_hugepages)
+    #  NUMAREPLICAS - keep a copy of the databases on every NUMA node and
+    #     pin each worker to the cores of one node so its lookups stay
+    #     local. Needs a copy of the databases per node in memory
+    #  The copies are filled in parallel by processes pinned to each node
+    HUGEPAGES = pl.HUGE_NONE
+    NUMAREPLICAS = False
+    # Memory budget in bytes for the pattern databases. None loads the
+    #  databases in DBFORMATS. Otherwise the subset of the databases (each
+    #  in the smallest format found for DBFILES) that fits in the budget
+    #  and is predicted to search the fewest nodes is loaded and DBFORMATS
+    #  is ignored. The search runs without the others. See rubik_db_budget.py
+    MEMBUDGET = None
+    # Extra pattern databases made by rubik_cube_fast_dbgen.py for other
+    #  sets of cubies, e.g. ['edge6']. They are loaded as int16 from their
+    #  npz files and the search takes the max over them as well
+    EXTRADBS = []
+    # Search over the cubies instead of the 48 faceids. The corner code
+    #  comes from move tables and the edge codes are ranked from the
+    #  cubies a move changed, so there is no ranking from the faces in the
+    #  search. Turned off with CORNERSYM and EDGE2FROMEDGE1, which need
+    #  the faceids, and needs EXTRADBS specs made from the corner_p_idx
+    #  and edge_p_idx faces (all the ones in db_specs are)
+    COORDMOVES = False
+    # Order the pattern dbs are looked up in (names from usedbnames).
+    #  A child is pruned by the first one that rules it out and the others
+    #  are skipped, so put the one that prunes the most first. The children
+    #  each one pruned are printed after the single core rounds. Dbs not
+    #  listed go after in the order they are loaded. None is load order
+    DBORDER = None
+    # Also look up the inverse of each cube in the 12p7 edge dbs (edge1,
+    #  edge2). The inverse is as far from solved so it prunes too. On depth
+    #  14 searches with the corner, alledge and edge1 dbs it expanded about
+    #  a third fewer nodes (39.1M vs 60.5M) and ran about 25% faster. The
+    #  dbs of whole cubie sets give the inverse the same value and are not
+    #  looked up again
+    DUALLOOKUPS = False
+    # Bidirectional pathmax. A child whose value is more than 1 above its
+    #  parent raises the bound of its siblings. Rarely prunes anything
+    BPMX = False
     # See the README.md for the nomenclature for entering the scrambled
     #  cube that you want to solve. solvedfaces is the solved cube
     #  This veriable isn't used it is just here for reference
@@ -699,58 +815,165 @@ if __name__ == '__main__':
     # init_faceids = [9, 32, 29, 68, 13, 41, 24, 76, 25, 40, 12, 61, 21, 64, 1, 52, 2, 65, 20, 72, 6, 36, 18, 44, 16, 37, 5, 56, 30, 33, 8, 49, 26, 53, 0, 45, 17, 48, 10, 77, 28, 57, 4, 73, 22, 60, 14, 69]
 
     print('Start Loading Pattern DBs')
-    # Load the corner config to solve turns DB
-    with np.load('rubik_corner_db.npz') as data:
-        cornerDB = data['db']
-    # Fix -1 score for solved state
-    idx = np.argmin(cornerDB)
-    cornerDB[idx] = 0
-    # Load the edge config to solve turns DB
-    with np.load('rubik_alledge_db.npz') as data:
-        edgeDB = data['db']
-    # Fix -1 score for solved state
-    idx = np.argmin(edgeDB)
-    edgeDB[idx] = 0
-    # Load the edge1 config to solve turns DB
-    with np.load('rubik_edge1_DFS_12p7_db.npz') as data:
-        edge1DB = data['db']
-    # Fix -1 score for solved state
-    idx = np.argmin(edge1DB)
-    edge1DB[idx] = 0
-    # Load the edge2 config to solve turns DB
-    with np.load('rubik_edge2_DFS_12p7_db.npz') as data:
-        edge2DB = data['db']
-    # Fix -1 score for solved state
-    idx = np.argmin(edge2DB)
-    edge2DB[idx] = 0
-    
     # Make shared raw arrays of pattern databases
-    print('Start making DBs shared')
     # Note that the 'h' designation in RawArray was used because
     #   'i' was too big for the np.int16.However, multiple times reading
     #  the documentation seemed to me that 'i' should have worked for int16 as well (2 bytes), but it didn't
     #  this disagreement in element size may break on other computers or implementations.
-    # make shared db storage
-    cshDB = RawArray('h', cornerDB.shape[0])
-    # make the numpy wrapper to this buffer
-    cshDB_np = np.frombuffer(cshDB, dtype=np.int16)
-    # now copy data into the shared storage
-    np.copyto(cshDB_np, cornerDB.astype(np.int16))
-    # repeat for other databases
-    eshDB = RawArray('h', edgeDB.shape[0])
-    eshDB_np = np.frombuffer(eshDB, dtype=np.int16)
-    np.copyto(eshDB_np, edgeDB.astype(np.int16))
-    e1shDB = RawArray('h', edge1DB.shape[0])
-    e1shDB_np = np.frombuffer(e1shDB, dtype=np.int16)
-    np.copyto(e1shDB_np, edge1DB.astype(np.int16))
-    e2shDB = RawArray('h', edge2DB.shape[0])
-    e2shDB_np = np.frombuffer(e2shDB, dtype=np.int16)
-    np.copyto(e2shDB_np, edge2DB.astype(np.int16))
-    patternDB_Storage.extend([cshDB, cornerDB.shape[0], \
-                              eshDB, edgeDB.shape[0],\
-                              e1shDB, edge1DB.shape[0],\
-                              e2shDB, edge2DB.shape[0]])
-    print('Done copying pattern db to shared memory')
+    allDBs = [] # numpy wrappers to the shared storage for use in this process
+    usedbnames = list(pdb.db_names)
+    usedbcodes = [pdb.db_codes[curname] for curname in usedbnames]
+    # The workers inherit the symmetry tables when they fork
+    if CORNERSYM:
+        usedbnames[0] = 'cornersym'
+        usedbcodes[0] = pdb.CODE_CORNER_SYM
+        sym_src, sym_relabel, perm_class, perm_sym, class_reps = rcs.corner_symmetry_tables()
+        rcmMP.set_corner_symmetry(sym_src, sym_relabel, perm_class, perm_sym)
+    if EDGE2FROMEDGE1:
+        usedbnames[3] = 'edge1'
+        usedbcodes[3] = pdb.CODE_EDGE1_SYM
+        DBFORMATS[3] = DBFORMATS[2]
+        sym_src, sym_relabel = rcs.conjugation_tables()
+        edge1sym, edge1sym_slots = rcs.edge1_image_symmetry(sym_src)
+        print('edge2 lookups use the edge1 database with symmetry {0:d}'.format(edge1sym))
+        rcmMP.set_edge1_symmetry(sym_src, sym_relabel, edge1sym)
+    useCoordMoves = int(COORDMOVES)
+    if useCoordMoves and (CORNERSYM or EDGE2FROMEDGE1):
+        print('COORDMOVES is off with the symmetry codes')
+        useCoordMoves = 0
+    useDualLookups = int(DUALLOOKUPS)
+    useBPMX = int(BPMX)
+    if MEMBUDGET is not None:
+        uselayouts = [DBLAYOUT if curcode in pdb.grouped_codes else pdb.LAYOUT_STD \
+                      for curcode in usedbcodes]
+        DBFORMATS, usebytes, slowdown = bud.choose_dbs(usedbnames, MEMBUDGET, DBFILES, uselayouts)
+        print('Memory budget {0:.0f} MB uses {1:.0f} MB'.format(MEMBUDGET/1.0e6, usebytes/1.0e6))
+        for curname, curfmt in zip(usedbnames, DBFORMATS):
+            print('  {0} {1}'.format(curname, pdb.db_format_names[curfmt]))
+        print('Predicted slowdown over all the databases {0:.2f}x'.format(slowdown))
+    for i, (curname, curfmt) in enumerate(zip(usedbnames, DBFORMATS)):
+        if curname in usedbnames[0:i]:
+            # Already loaded share it
+            j = usedbnames.index(curname)
+            allDBs.append(allDBs[j])
+            patternDB_Storage.extend(patternDB_Storage[2*j:2*j+2])
+            patternDB_Formats.append(patternDB_Formats[j])
+            patternDB_MaxVals.append(patternDB_MaxVals[j])
+            patternDB_Codes.append(usedbcodes[i])
+            patternDB_Layouts.append(patternDB_Layouts[j])
+            patternDB_Specs.append(None)
+            continue
+        if curfmt == pdb.DB_MOD3 and not pdb.db_consistent[curname]:
+            print('{0} database cannot be stored mod 3'.format(curname))
+            exit()
+        # The other databases are the same in both layouts
+        curlayout = DBLAYOUT if usedbcodes[i] in pdb.grouped_codes else pdb.LAYOUT_STD
+        if curfmt == pdb.DB_NONE:
+            # Left out of the search
+            shDB = None
+            shDB_np = None
+            ndb = 0
+            curmax = -1
+            curlayout = pdb.LAYOUT_STD
+        elif DBFILES == 'raw':
+            # The memory map is read only and the workers inherit it
+            #  so nothing is copied. The solved entry was fixed when
+            #  the raw file was written
+            shDB, ndb, curfmt, curmax, curlayout = pdb.map_raw_db(pdb.raw_db_file(curname, curfmt, curlayout))
+            if curfmt == pdb.DB_INT16:
+                shDB_np = shDB.view(np.int16)
+            else:
+                shDB_np = shDB
+        elif DBFILES == 'blocks':
+            # Only the compressed blocks are in shared memory. The cache
+            #  is malloced so every worker gets its own copy when it forks
+            curfile = pdb.blocks_db_file(curname, curfmt, curlayout)
+            shDB = RawArray('B', pdb.compressed_nbytes(curfile))
+            shDB_np = np.frombuffer(shDB, dtype=np.uint8)
+            shDB_np, offsets, ndb, curfmt, curmax, chunk, curlayout = pdb.load_compressed_blocks(curfile, out=shDB_np)
+            nslots = int(BLOCKCACHE_MB * 1.0e6 // pdb.packed_nbytes(chunk, curfmt))
+            shDB = rcmMP.BlockCacheDB(shDB, offsets, ndb, curfmt, chunk, max(nslots, 1))
+            shDB_np = shDB
+            print('{0} compressed {1:.0f} MB cache {2:.0f} MB'.format(curname, \
+                  offsets[-1]/1.0e6, shDB.cache_bytes/1.0e6))
+        elif DBFILES == 'chunked':
+            # The header gives the size to allocate then the blocks are
+            #  decompressed directly into the shared storage
+            curfile = pdb.chunked_db_file(curname, curfmt, curlayout)
+            ndb = pdb.chunked_db_info(curfile)[1]
+            shDB = RawArray('B', pdb.packed_nbytes(ndb, curfmt))
+            shDB_np = np.frombuffer(shDB, dtype=np.uint8)
+            shDB_np, ndb, curfmt, curmax, curlayout = pdb.load_chunked_db(curfile, out=shDB_np, nthreads=USENCPUS)
+            if curfmt == pdb.DB_INT16:
+                shDB_np = shDB_np.view(np.int16)
+        elif not curfmt == pdb.DB_INT16:
+            # Packed databases are loaded as is
+            curDB, ndb, curfmt, curmax, curlayout = pdb.load_packed_db(pdb.packed_db_file(curname, curfmt, curlayout))
+            # make shared db storage
+            shDB = RawArray('B', curDB.shape[0])
+            # make the numpy wrapper to this buffer
+            shDB_np = np.frombuffer(shDB, dtype=np.uint8)
+            # now copy data into the shared storage
+            np.copyto(shDB_np, curDB)
+            del curDB
+        else:
+            # Load the config to solve turns DB and fix -1 score for solved state
+            curDB = pdb.load_npz_db(pdb.db_npz_files[curname])
+            if curlayout == pdb.LAYOUT_GROUPED:
+                curDB = pdb.to_grouped_layout(curDB, usedbcodes[i])
+            ndb = curDB.shape[0]
+            curmax = int(curDB.max())
+            shDB = RawArray('h', ndb)
+            shDB_np = np.frombuffer(shDB, dtype=np.int16)
+            np.copyto(shDB_np, curDB.astype(np.int16))
+            del curDB
+        allDBs.append(shDB_np)
+        patternDB_Storage.extend([shDB, ndb])
+        patternDB_Formats.append(curfmt)
+        patternDB_MaxVals.append(curmax)
+        patternDB_Codes.append(usedbcodes[i])
+        patternDB_Layouts.append(curlayout)
+        patternDB_Specs.append(None)
+    for curname in EXTRADBS:
+        curfile = pdb.spec_npz_file(curname)
+        curDB = pdb.load_npz_db(curfile)
+        ndb = curDB.shape[0]
+        shDB = RawArray('h', ndb)
+        shDB_np = np.frombuffer(shDB, dtype=np.int16)
+        np.copyto(shDB_np, curDB.astype(np.int16))
+        del curDB
+        print('Extra pattern db {0} {1:d} entries'.format(curname, ndb))
+        usedbnames.append(curname)
+        allDBs.append(shDB_np)
+        patternDB_Storage.extend([shDB, ndb])
+        patternDB_Formats.append(pdb.DB_INT16)
+        patternDB_MaxVals.append(int(shDB_np.max()))
+        patternDB_Codes.append(pdb.CODE_SPEC)
+        patternDB_Layouts.append(pdb.LAYOUT_STD)
+        patternDB_Specs.append(pdb.load_npz_spec(curfile))
+    if DBFILES == 'blocks' and (not HUGEPAGES == pl.HUGE_NONE or NUMAREPLICAS):
+        print('HUGEPAGES and NUMAREPLICAS do not work with the block compressed databases')
+        exit()
+    if not HUGEPAGES == pl.HUGE_NONE or NUMAREPLICAS:
+        usenodes = pl.numa_nodes() if NUMAREPLICAS else [sorted(os.sched_getaffinity(0))]
+        print('Placing pattern dbs on {0:d} node(s) huge pages: {1}'.format(len(usenodes), \
+              pl.huge_names[HUGEPAGES]))
+        replicas = pl.replicate_dbs(allDBs, usenodes, HUGEPAGES)
+        for cpus, currep in zip(usenodes, replicas):
+            patternDB_Replicas.append((cpus, [x for i, (buf, view) in enumerate(currep) \
+                                              for x in (buf, patternDB_Storage[2*i+1])]))
+        # The main process uses the first copy and the originals are freed
+        patternDB_Storage[:] = patternDB_Replicas[0][1]
+        allDBs = [view for buf, view in replicas[0]]
+        del shDB, shDB_np
+        if not NUMAREPLICAS:
+            # Only huge pages were asked for so leave the workers free
+            patternDB_Replicas.clear()
+    patternDB_Order[:] = [i for curname in (DBORDER or []) \
+                          for i, x in enumerate(usedbnames) if x == curname]
+    patternDB_Order.extend([i for i in range(len(usedbnames)) if not i in patternDB_Order])
+    print('Pattern db lookup order ' + ' '.join([usedbnames[i] for i in patternDB_Order]))
+    print('Done setting up pattern db shared memory')
     print('Elapsed time for setup (s) {0:.1f}'.format(timer()-startts))
     # Calculate the Lehmer Get the initial cube distance
     lehcode = lc.lehmer_code(8)
@@ -763,13 +986,12 @@ if __name__ == '__main__':
     edge2_statecode = bcube.getstate_edgesplit(np.array(init_faceids), edge2_lehcode, 1)
     print(statecode, edge_statecode, edge1_statecode, edge2_statecode)
     # Based on the lehmer code look up the moves until end for each database
-    cs = cornerDB[statecode]
-    ce = edgeDB[edge_statecode]
-    ce1 = edge1DB[edge1_statecode]
-    ce2 = edge2DB[edge2_statecode]
-    score = np.max([cs, ce, ce1, ce2])
+    #  The mod3 databases only give the distance mod 3 so let the cython
+    #  side work out the full distances
+    scores = rcmMP.pattern_db_scores(bytes(init_faceids), allDBs, patternDB_Formats, patternDB_MaxVals, patternDB_Codes, patternDB_Layouts, patternDB_Specs)
+    score = np.max(scores)
     print('Max & Initial Scores')
-    print(score, cs, ce, ce1, ce2)
+    print(score, *scores)
     # Since cubes are always solvable in <=20 moves
     # this is the largets depth from the initial score we need to explore
     largest_MAXDELDEP = 20 - score
@@ -785,7 +1007,25 @@ if __name__ == '__main__':
         if not retval == 2: # Found solution yet?
             print('Trying MAXDELDEP {0:d} MaxLevel: {1:d}'.format(MAXDELDEP, useMaxLevel))
             # Call the DFS cython that does all the work to MAXDELDEP
-            retval = rcm.DFS_cython_solve(bytes(init_faceids), MAXDELDEP, cornerDB, edgeDB, edge1DB, edge2DB)
+            #  Starting from the initial cube the first moves are level 1
+            #  and there is no last move to prune (18)
+            retval = rcmMP.DFS_cython_solve(bytes(init_faceids), useMaxLevel, 1, 18, allDBs, patternDB_Formats, patternDB_MaxVals, patternDB_Codes, patternDB_Layouts, patternDB_Specs, useCoordMoves, dborder=patternDB_Order, dual=useDualLookups, bpmx=useBPMX)
+    print('Children pruned by ' + ' '.join(['{0} {1:d}'.format(curname, curcnt) \
+          for curname, curcnt in zip(usedbnames, rcmMP.db_cutoff_counts())]))
+    print('Lookups skipped by ' + ' '.join(['{0} {1:d}'.format(curname, curcnt) \
+          for curname, curcnt in zip(usedbnames, rcmMP.db_skip_counts())]))
+    if useDualLookups or useBPMX:
+        dualcnts, bpmxcnt = rcmMP.dual_cutoff_counts()
+        print('Children pruned by the inverse in ' + ' '.join(['{0} {1:d}'.format(curname, curcnt) \
+              for curname, curcnt in zip(usedbnames, dualcnts)]) + ' bpmx {0:d}'.format(bpmxcnt))
+    if DBFILES == 'blocks':
+        for curname, curDB in zip(usedbnames, allDBs):
+            if isinstance(curDB, rcmMP.BlockCacheDB):
+                print('{0} block cache hits {1:d} misses {2:d} errors {3:d}'.format(curname, \
+                      curDB.hits, curDB.misses, curDB.errors))
+                if curDB.errors > 0:
+                    print('{0} has blocks that do not decompress. Exiting'.format(curname))
+                    exit()
     print('Now Trying MP for larger rounds')
     # Save the cube states after the first set of turns
     # newmoves holds the facieds after the first 18 turns
@@ -819,7 +1059,11 @@ if __name__ == '__main__':
 
             # Have all the worker arguments loaded 
             # initialize the pool of workes                
-            pmp = Pool(processes = USENCPUS)
+            if len(patternDB_Replicas) > 0:
+                pmp = Pool(processes = USENCPUS, initializer=worker_placement, \
+                           initargs=(Value('i', 0),))
+            else:
+                pmp = Pool(processes = USENCPUS)
 
             results = [] # This will store results
                          # This gets populated in log_quitter() callback function
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+Pick which pattern databases to load for a memory budget.
+  Not every host can hold all four databases. Each database is tried in
+  the smallest format found on disk and every subset of the databases that
+  fits in the budget is scored by the number of nodes the search is
+  predicted to expand. The databases left out are passed to
+  DFS_cython_solve as DB_NONE and the search runs with the rest.
+  The prediction follows Korf, Reid & Edelkamp (2001). The number of nodes
+  expanded by an iteration to depth d is
+    N(d) = sum_i N(i) P(h <= d - i)
+  with N(i) the number of nodes at depth i of the search tree with the
+  redundant moves pruned (tree_sizes from the ignore_moves table of the
+  solver, about 13.98 times more per level) and P the distribution of the
+  heuristic. The heuristic is the max over the loaded databases,
+  which are treated as independent, so P(h <= x) is the product of their
+  cumulative distributions.
+  The distributions come from histogram files made by running this
+  routine next to the original npz databases. Without a histogram file a
+  database gets a bell shaped distribution around its rough mean distance
+  from db_mean_estimates. That is enough to rank the subsets but the
+  predicted slowdown will be crude.
+python rubik_db_budget.py
+"""
+import os
+import itertools
+import numpy as np
+import rubik_pattern_db as pdb
+
+# Search depth the slowdown is predicted for
+PREDICT_DEPTH = 18
+# Rough mean distance of each database. Only used when there is no
+#  histogram file for it
+db_mean_estimates = {'corner':8.76, 'alledge':8.5, 'edge1':7.9, 'edge2':7.9, \
+                     'cornersym':8.76}
+# Formats to try for each database, smallest first
+budget_formats = [pdb.DB_MOD3, pdb.DB_NIBBLE, pdb.DB_INT16]
+
+# The moves allowed after each last move (18 for none). Copy of
+#  ignore_moves in rubik_cython_roll_buffdq_solve_MP2.py
+ignore_moves = {0:[2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17],\
+                1:[2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17],\
+                2:[3,4,5,6,7,8,9,10,11,12,13,14,15,16,17],\
+                3:[5,6,7,8,9,10,11,12,13,14,15,16,17],\
+                4:[5,6,7,8,9,10,11,12,13,14,15,16,17],\
+                5:[6,7,8,9,10,11,12,13,14,15,16,17],\
+                6:[0,1,2,3,4,5,8,9,10,11,12,13,14,15,16,17],\
+                7:[0,1,2,3,4,5,8,9,10,11,12,13,14,15,16,17],\
+                8:[0,1,2,3,4,5,9,10,11,12,13,14,15,16,17],\
+                9:[0,1,2,3,4,5,11,12,13,14,15,16,17],\
+                10:[0,1,2,3,4,5,11,12,13,14,15,16,17],\
+                11:[0,1,2,3,4,5,12,13,14,15,16,17],\
+                12:[0,1,2,3,4,5,6,7,8,9,10,11,14,15,16,17],\
+                13:[0,1,2,3,4,5,6,7,8,9,10,11,14,15,16,17],\
+                14:[0,1,2,3,4,5,6,7,8,9,10,11,15,16,17],\
+                15:[0,1,2,3,4,5,6,7,8,9,10,11,17],\
+                16:[0,1,2,3,4,5,6,7,8,9,10,11,17],\
+                17:[0,1,2,3,4,5,6,7,8,9,10,11],\
+                18:[0,1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17]}
+
+# Number of nodes at each depth 0..maxdepth of the search tree
+#  Moves are pruned after the last move with ignore_moves
+def tree_sizes(maxdepth):
+    counts = np.zeros((19,), dtype=float)
+    counts[18] = 1.0 # no last move at the root
+    sizes = [1.0]
+    for i in range(maxdepth):
+        newcounts = np.zeros((19,), dtype=float)
+        for last in range(19):
+            for m in ignore_moves[last]:
+                newcounts[m] = newcounts[m] + counts[last]
+        counts = newcounts
+        sizes.append(counts.sum())
+    return np.array(sizes)
+
+# Name of the histogram file for a database
+def hist_file(name):
+    return 'rubik_{0}_db_hist.npy'.format(name)
+
+# Count how many entries of an original npz database have each distance
+#  Streams through the file a chunk at a time
+def make_histogram(name):
+    hist = np.zeros((32,), dtype=np.int64)
+    for n, cur in pdb.iter_npz_chunks(pdb.db_npz_files[name]):
+        hist = hist + np.bincount(cur, minlength=32)[0:32]
+    return hist
+
+# Fraction of the database entries at each distance 0..31
+#  from the histogram file. If there is none use a gaussian with a width of
+#  one move around the rough mean
+def db_distribution(name):
+    if os.path.exists(hist_file(name)):
+        hist = np.load(hist_file(name)).astype(float)
+        return hist / hist.sum()
+    dist = np.exp(-0.5 * (np.arange(32) - db_mean_estimates[name])**2)
+    return dist / dist.sum()
+
+# Predicted nodes expanded by an iteration to depth d when the heuristic
+#  is the max of the databases with the given distributions
+def predicted_nodes(dists, d=PREDICT_DEPTH):
+    cdf = np.ones((32,))
+    for dist in dists:
+        cdf = cdf * np.cumsum(dist)
+    sizes = tree_sizes(d)
+    nodes = 0.0
+    for i in range(d+1):
+        nodes = nodes + sizes[i] * cdf[min(d - i, 31)]
+    return nodes
+
+# Smallest format a database is found on disk in
+#  None if no file for it is found
+def smallest_format(name, dbfiles, layout=pdb.LAYOUT_STD):
+    for fmt in budget_formats:
+        if fmt == pdb.DB_MOD3 and not pdb.db_consistent[name]:
+            continue
+        if os.path.exists(pdb.db_file(name, fmt, dbfiles, layout)):
+            return fmt
+    return None
+
+# Choose the databases to load
+# INPUT
+# names - database name of each of the 4 slots passed to DFS_cython_solve.
+#    A name can appear twice (EDGE2FROMEDGE1) and is then loaded once
+# budget - memory budget in bytes
+# dbfiles - 'npz', 'raw' or 'chunked' where the databases are read from
+# layouts (optional) - index layout of each slot
+# OUTPUT storage format of each slot (DB_NONE for the ones left out),
+#  bytes of memory used, predicted slowdown over loading all the
+#  databases that were found
+def choose_dbs(names, budget, dbfiles, layouts=None):
+    if layouts is None:
+        layouts = [pdb.LAYOUT_STD] * len(names)
+    uniq = []
+    for curname, curlayout in zip(names, layouts):
+        if curname in [x[0] for x in uniq]:
+            continue
+        fmt = smallest_format(curname, dbfiles, curlayout)
+        if fmt is None:
+            print('No {0} file for {1} it will not be used'.format(dbfiles, curname))
+            continue
+        if dbfiles == 'blocks':
+            # Kept compressed. The block caches are not counted
+            nbytes = pdb.compressed_nbytes(pdb.db_file(curname, fmt, dbfiles, curlayout))
+        else:
+            nbytes = pdb.packed_nbytes(pdb.db_sizes[curname], fmt)
+        uniq.append((curname, fmt, nbytes))
+    dists = {curname:db_distribution(curname) for curname, fmt, nbytes in uniq}
+    fullnodes = predicted_nodes([dists[x] for x in names if x in dists])
+    best = None
+    for k in range(len(uniq), -1, -1):
+        for subset in itertools.combinations(uniq, k):
+            nbytes = sum([x[2] for x in subset])
+            if nbytes > budget:
+                continue
+            usenames = [x[0] for x in subset]
+            nodes = predicted_nodes([dists[x] for x in names if x in usenames])
+            # Fewest nodes then least memory
+            if best is None or nodes < best[0] * (1.0 - 1.0e-9) or \
+                    (nodes <= best[0] * (1.0 + 1.0e-9) and nbytes < best[1]):
+                best = (nodes, nbytes, subset)
+    nodes, nbytes, subset = best
+    usefmts = {x[0]:x[1] for x in subset}
+    formats = [usefmts.get(curname, pdb.DB_NONE) for curname in names]
+    return formats, nbytes, nodes / fullnodes
+
+if __name__ == '__main__':
+    # Make the histogram files for the original databases that are here
+    for curname in pdb.db_npz_files:
+        if not os.path.exists(pdb.db_npz_files[curname]):
+            print('Skipping {0} {1} not found'.format(curname, pdb.db_npz_files[curname]))
+            continue
+        hist = make_histogram(curname)
+        np.save(hist_file(curname), hist)
+        dist = hist / hist.sum()
+        print('{0} mean distance {1:.3f} max {2:d}'.format(curname, \
+              np.sum(dist * np.arange(32)), int(np.max(np.nonzero(hist)))))
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+Benchmark of the pattern database index layouts.
+  Walks a cube through random moves and at every step looks up all 18
+  children in one database the same way DFS_cython_solve does
+  (bench_child_lookups in rubik_cython_roll_buffdq_solve_MP.pyx) and reports
+  lookups per second for the standard and the grouped index layout
+  (see grouped_index in rubik_pattern_db.py).
+  If the original npz database is found it is packed in both layouts and
+  the sums of the looked up values are checked to agree. Otherwise random
+  tables of the same size are used. Only the memory access pattern matters
+  for the timing so that is good enough.
+python rubik_db_layout_bench.py [corner|edge1|edge2|alledge] [nsteps]
+"""
+import os
+import sys
+from timeit import default_timer as timer
+import numpy as np
+import rubik_pattern_db as pdb
+import rubik_cube_symmetry as rcs
+import rubik_cython_roll_buffdq_solve_MP as rcmMP
+
+# Make the nibble packed database in the standard and grouped layout
+#  The grouped one is None for databases that are the same in both
+def make_tables(curname):
+    code = pdb.db_codes[curname]
+    if os.path.exists(pdb.db_npz_files[curname]):
+        print('Using {0}'.format(pdb.db_npz_files[curname]))
+        db = pdb.load_npz_db(pdb.db_npz_files[curname])
+        std = pdb.pack_nibbles(db)
+        grouped = None
+        if code in pdb.grouped_codes:
+            grouped = pdb.pack_nibbles(pdb.to_grouped_layout(db, code))
+        return std, grouped, True
+    print('{0} not found using random values'.format(pdb.db_npz_files[curname]))
+    rng = np.random.default_rng(1)
+    nbytes = pdb.packed_nbytes(pdb.db_sizes[curname], pdb.DB_NIBBLE)
+    std = rng.integers(0, 256, size=nbytes, dtype=np.uint8)
+    grouped = None
+    if code in pdb.grouped_codes:
+        grouped = std.copy()
+    return std, grouped, False
+
+if __name__ == '__main__':
+    usenames = ['corner', 'edge1', 'edge2', 'alledge']
+    if len(sys.argv) > 1:
+        usenames = [sys.argv[1]]
+    nsteps = 2000000
+    if len(sys.argv) > 2:
+        nsteps = int(sys.argv[2])
+    solved = bytes(rcs.facecodeints.astype(np.uint8))
+    rng = np.random.default_rng(2)
+    moves = rng.integers(0, 18, size=nsteps)
+    for curname in usenames:
+        code = pdb.db_codes[curname]
+        std, grouped, isreal = make_tables(curname)
+        sums = []
+        for layout, table in [(pdb.LAYOUT_STD, std), (pdb.LAYOUT_GROUPED, grouped)]:
+            if table is None:
+                print('{0} grouped layout is the same as the standard one'.format(curname))
+                continue
+            # Warm up so the pages are faulted in before timing
+            rcmMP.bench_child_lookups(solved, moves[0:nsteps//10], table, \
+                                      pdb.DB_NIBBLE, code, layout)
+            startts = timer()
+            nlook, total = rcmMP.bench_child_lookups(solved, moves, table, \
+                                                     pdb.DB_NIBBLE, code, layout)
+            elapsed = timer() - startts
+            sums.append(total)
+            print('{0} {1} {2:.2f} M lookups/s'.format(curname, \
+                  pdb.db_layout_names[layout], nlook / elapsed / 1.0e6))
+        if isreal and len(sums) == 2 and not sums[0] == sums[1]:
+            print('{0} lookups differ between the layouts'.format(curname))
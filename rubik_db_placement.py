@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+Memory placement of the pattern databases on multi socket hosts.
+  The RawArray storage ends up on whichever NUMA node first touched the
+  pages (the node of the main process while loading) and every lookup from
+  a worker on another socket goes across the interconnect. Here the
+  databases can be copied into shared anonymous memory backed by huge pages
+  and replicated once per NUMA node. Each replica is filled by processes
+  pinned to the cores of its node. Linux puts a page on the node of the
+  process that first touches it, so the replica lands on that node and
+  all of its pages are faulted in up front, in parallel.
+  The MP2 driver then pins each pool worker to the cores of one node and
+  points it at the replica on that node.
+  Huge pages
+   HUGE_THP - transparent huge pages. For shared memory the kernel only
+     uses them if /sys/kernel/mm/transparent_hugepage/shmem_enabled is
+     advise or always
+   HUGE_TLBFS - explicit huge pages from the hugetlbfs mount HUGETLBFS_DIR.
+     Reserve enough of them first, e.g. sysctl vm.nr_hugepages=2048 for
+     4GB of 2MB pages
+  Only the Linux /sys and sched_setaffinity interfaces are used, no numa
+  library is needed. Without /sys/devices/system/node everything is one node.
+"""
+import os
+import glob
+import mmap
+import tempfile
+from multiprocessing import get_context
+import numpy as np
+
+# How the database copies are backed
+HUGE_NONE = 0 # normal pages
+HUGE_THP = 1 # transparent huge pages (madvise)
+HUGE_TLBFS = 2 # explicit huge pages from hugetlbfs
+huge_names = {HUGE_NONE:'none', HUGE_THP:'thp', HUGE_TLBFS:'hugetlbfs'}
+HUGETLBFS_DIR = '/dev/hugepages'
+
+# Size of a huge page in bytes from /proc/meminfo (2MB if not found)
+def huge_page_size():
+    try:
+        with open('/proc/meminfo') as fp:
+            for line in fp:
+                if line.startswith('Hugepagesize:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 2 * 1024 * 1024
+
+# Parse a /sys cpu list like '0-7,16-23'
+def parse_cpulist(cpulist):
+    cpus = []
+    for part in cpulist.strip().split(','):
+        if part == '':
+            continue
+        if '-' in part:
+            lo, hi = part.split('-')
+            cpus.extend(range(int(lo), int(hi)+1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+# The cpus of each NUMA node this process is allowed to run on
+#  Nodes with no usable cpus (memory only nodes) are dropped
+# OUTPUT list of cpu lists, one per node
+def numa_nodes():
+    allowed = os.sched_getaffinity(0)
+    nodes = []
+    nodedirs = glob.glob('/sys/devices/system/node/node[0-9]*')
+    for nodedir in sorted(nodedirs, key=lambda x: int(x.split('node')[-1])):
+        with open(os.path.join(nodedir, 'cpulist')) as fp:
+            cpus = [c for c in parse_cpulist(fp.read()) if c in allowed]
+        if len(cpus) > 0:
+            nodes.append(cpus)
+    if len(nodes) == 0:
+        nodes = [sorted(allowed)]
+    return nodes
+
+# Allocate nbytes of shared anonymous memory that fork()ed workers see
+#  The pages are not touched here so they are placed by whoever
+#  writes them first
+# OUTPUT mmap object of at least nbytes (rounded up to whole huge pages
+#  when huge pages are used)
+def alloc_shared(nbytes, huge=HUGE_NONE):
+    if huge == HUGE_NONE:
+        return mmap.mmap(-1, nbytes)
+    hpsz = huge_page_size()
+    size = (nbytes + hpsz - 1) // hpsz * hpsz
+    if huge == HUGE_THP:
+        buf = mmap.mmap(-1, size)
+        buf.madvise(mmap.MADV_HUGEPAGE)
+        return buf
+    if not os.path.isdir(HUGETLBFS_DIR):
+        raise ValueError('No hugetlbfs mounted at {0}'.format(HUGETLBFS_DIR))
+    # The file is unlinked right away, the mapping keeps the pages
+    fd, fname = tempfile.mkstemp(prefix='rubikpdb', dir=HUGETLBFS_DIR)
+    try:
+        os.ftruncate(fd, size)
+        buf = mmap.mmap(fd, size)
+    finally:
+        os.unlink(fname)
+        os.close(fd)
+    return buf
+
+# Worker for fill_pinned. Runs in its own process pinned to cpus and copies
+#  its slices of the sources into the destinations
+def _fill_slices(cpus, jobs):
+    os.sched_setaffinity(0, cpus)
+    for src, dst, beg, end in jobs:
+        np.copyto(dst[beg:end], src[beg:end])
+
+# Fill destination buffers from sources with one process per cpu of each
+#  node all running at once. Each process is pinned to the cpus of the node
+#  the destinations belong to so it first touches (and places) those pages
+# INPUT
+# fills - list over nodes of (cpus of the node, list of (uint8 source
+#    array, uint8 destination array) to copy)
+def fill_pinned(fills):
+    ctx = get_context('fork')
+    align = huge_page_size()
+    procs = []
+    for cpus, copies in fills:
+        jobs = [[] for k in range(len(cpus))]
+        for src, dst in copies:
+            # Split on huge page boundaries so no page is shared by two fillers
+            step = (len(src) + len(cpus) - 1) // len(cpus)
+            step = (step + align - 1) // align * align
+            for k, beg in enumerate(range(0, len(src), step)):
+                jobs[k].append((src, dst, beg, min(len(src), beg + step)))
+        for curjobs in jobs:
+            if len(curjobs) > 0:
+                p = ctx.Process(target=_fill_slices, args=(cpus, curjobs))
+                p.start()
+                procs.append(p)
+    for p in procs:
+        p.join()
+        if not p.exitcode == 0:
+            raise RuntimeError('Pattern database fill process failed')
+
+# Copy the databases into new shared memory, one copy per node
+# INPUT
+# dbs - list of numpy arrays of the databases (any dtype). The same array
+#    object listed twice gets one copy. None entries (databases that are
+#    not loaded) stay None
+# nodes - list of cpu lists, one replica is made for each
+# huge - HUGE_NONE, HUGE_THP or HUGE_TLBFS
+# OUTPUT list over nodes of lists of (mmap buffer, numpy view with the
+#  dtype and length of the original) for each database
+def replicate_dbs(dbs, nodes, huge=HUGE_NONE):
+    replicas = []
+    fills = []
+    for cpus in nodes:
+        cur = []
+        copies = []
+        for i, db in enumerate(dbs):
+            j = [id(x) for x in dbs].index(id(db))
+            if j < i:
+                cur.append(cur[j])
+                continue
+            if db is None:
+                cur.append((None, None))
+                continue
+            buf = alloc_shared(db.nbytes, huge)
+            view = np.frombuffer(buf, dtype=db.dtype, count=len(db))
+            copies.append((db.view(np.uint8), view.view(np.uint8)))
+            cur.append((buf, view))
+        replicas.append(cur)
+        fills.append((cpus, copies))
+    fill_pinned(fills)
+    return replicas
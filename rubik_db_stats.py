@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+Statistics of the pattern databases and a prediction of the search effort.
+  For each database the distribution of its values and the mean heuristic
+  are found by streaming through its npz file. Every entry of a database
+  stands for the same number of cubes so this is the distribution of the
+  heuristic over all cubes.
+  The search prunes with the max over the databases. They are not
+  independent (rubik_db_budget.py assumes they are) so the distribution of
+  the max comes from NSAMPLES random cubes. The cubes are made by random
+  walks of WALKLEN moves from solved, ranked with the specs of
+  rubik_cube_fast_dbgen.py and looked up in the databases in the same pass
+  through the npz files.
+  The nodes expanded by an iteration to depth d follow Korf, Reid &
+  Edelkamp (2001)
+    E(d) = sum_i N(i) P(h <= d - i)
+  with N(i) the number of nodes at depth i of the search tree with the
+  redundant moves pruned (tree_sizes in rubik_db_budget.py, from the
+  ignore_moves table of the solver) and P the distribution of the max
+  heuristic. Dividing by NODES_PER_SEC per core
+  times USENCPUS gives a rough time for the solves of each length.
+  NODES_PER_SEC is host specific. Measure it from the Total Moves and
+  time of a single core solve.
+python rubik_db_stats.py [corner alledge edge1 edge2 ...]
+"""
+import os
+import sys
+from multiprocessing import cpu_count
+import numpy as np
+import rubik_pattern_db as pdb
+import rubik_db_budget as bud
+import rubik_cube_fast_dbgen as fg
+import rubik_cube_symmetry as rcs
+
+# Largest heuristic value kept in the distributions
+MAXVAL = 32
+# Random cubes from random walks of nwalk moves from solved
+# OUTPUT (nsamp, 48) faceids
+def random_cubes(nsamp, nwalk, seed=0):
+    move_dst = fg.move_facelet_perms()
+    # Facelet p moves to move_dst[m, p] so the new cube reads its
+    #  facelet q from the inverse
+    move_src = np.zeros_like(move_dst)
+    for m in range(18):
+        move_src[m, move_dst[m]] = np.arange(48)
+    rng = np.random.default_rng(seed)
+    fcs = np.tile(rcs.facecodeints.astype(np.uint8), (nsamp, 1))
+    rows = np.arange(nsamp)[:, None]
+    for i in range(nwalk):
+        fcs = fcs[rows, move_src[rng.integers(0, 18, nsamp)]]
+    return fcs
+
+# Histogram of a database and its values at the indices idx
+#  One pass through the npz file a chunk at a time
+def db_hist_and_values(filename, idx):
+    order = np.argsort(idx)
+    sidx = idx[order]
+    vals = np.zeros((len(idx),), dtype=np.int16)
+    hist = np.zeros((MAXVAL,), dtype=np.int64)
+    start = 0
+    for n, cur in pdb.iter_npz_chunks(filename):
+        hist = hist + np.bincount(cur, minlength=MAXVAL)[0:MAXVAL]
+        lo, hi = np.searchsorted(sidx, [start, start + len(cur)])
+        vals[order[lo:hi]] = cur[sidx[lo:hi] - start]
+        start = start + len(cur)
+    return hist, vals
+
+# Predicted nodes expanded by an iteration to depth d
+#  dist is the distribution of the heuristic 0..MAXVAL-1
+def korf_nodes(dist, d, sizes):
+    cdf = np.cumsum(dist)
+    return sum([sizes[i] * cdf[min(d - i, MAXVAL - 1)] for i in range(d+1)])
+
+if __name__ == '__main__':
+    # Databases to use. Any name in db_specs of rubik_cube_fast_dbgen.py
+    #  with its npz file here
+    USEDBS = ['corner', 'alledge', 'edge1', 'edge2']
+    if len(sys.argv) > 1:
+        USEDBS = sys.argv[1:]
+    # Random cubes for the distribution of the max
+    NSAMPLES = 1000000
+    WALKLEN = 40
+    # Nodes (Total Moves) per second of one core
+    NODES_PER_SEC = 1.0e6
+    USENCPUS = cpu_count()
+    # Search depths to predict
+    PREDICT_DEPTHS = range(12, 21)
+
+    fcs = random_cubes(NSAMPLES, WALKLEN)
+    usedists = []
+    hmax = np.zeros((NSAMPLES,), dtype=np.int16)
+    for curname in USEDBS:
+        curfile = pdb.spec_npz_file(curname)
+        if not os.path.exists(curfile):
+            print('Skipping {0} {1} not found'.format(curname, curfile))
+            continue
+        idx = fg.spec_index_batch(fg.db_specs[curname], fcs)
+        hist, vals = db_hist_and_values(curfile, idx)
+        # Share the histogram with rubik_db_budget.py
+        np.save(bud.hist_file(curname), hist)
+        dist = hist / hist.sum()
+        usedists.append(dist)
+        hmax = np.maximum(hmax, vals)
+        print('{0} {1:d} entries mean {2:.3f} max {3:d} sampled mean {4:.3f}'.format(curname, \
+              int(hist.sum()), np.sum(dist * np.arange(MAXVAL)), int(np.max(np.nonzero(hist))), \
+              vals.mean()))
+        print('  ' + ' '.join(['{0:d}:{1:.2e}'.format(i, x) for i, x in enumerate(dist) if x > 0]))
+    if len(usedists) == 0:
+        print('No databases found')
+        exit()
+    maxdist = np.bincount(hmax, minlength=MAXVAL)[0:MAXVAL] / NSAMPLES
+    # What the max would be if the databases were independent
+    indcdf = np.prod([np.cumsum(x) for x in usedists], axis=0)
+    inddist = np.diff(np.concatenate(([0.0], indcdf)))
+    print('max heuristic mean {0:.3f} (independent databases {1:.3f})'.format( \
+          np.sum(maxdist * np.arange(MAXVAL)), np.sum(inddist * np.arange(MAXVAL))))
+    print('  ' + ' '.join(['{0:d}:{1:.2e}'.format(i, x) for i, x in enumerate(maxdist) if x > 0]))
+
+    sizes = bud.tree_sizes(max(PREDICT_DEPTHS))
+    print('Effective branching factor {0:.3f}'.format(sizes[-1] / sizes[-2]))
+    print('depth  nodes(iteration)  nodes(all iterations)  hours on {0:d} cores'.format(USENCPUS))
+    total = 0.0
+    for d in range(max(PREDICT_DEPTHS) + 1):
+        nodes = korf_nodes(maxdist, d, sizes)
+        total = total + nodes
+        if d in PREDICT_DEPTHS:
+            print('{0:5d}  {1:16.3e}  {2:21.3e}  {3:10.3f}'.format(d, nodes, total, \
+                  total / (NODES_PER_SEC * USENCPUS) / 3600.0))
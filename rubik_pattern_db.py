@@ -0,0 +1,559 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+Storage formats for the pattern databases.
+  The downloaded pattern databases are numpy int arrays with one distance
+  to solve per entry. All the distances fit in 4 bits (the largest value in
+  any of the four databases is 11), so the databases can be packed two
+  entries per byte. This cuts the memory needed for the four databases
+  from ~3.2GB as int16 down to ~0.8GB.
+  A consistent database (neighboring cube configurations differ by at most
+  one move in distance) can go further and only store the distance mod 3
+  in 2 bits. The search knows the exact distance of the parent so it can
+  rebuild the exact distance of the child (Korf). See db_consistent below
+  for which of the databases this applies to.
+  The DFS_cython_solve in rubik_cython_roll_buffdq_solve_MP.pyx reads
+  the packed databases directly. Running this routine converts the
+  original npz databases into the packed ones.
+  Any of the formats can also be written uncompressed to a raw .bin file.
+  The raw files are memory mapped instead of loaded, so there is no
+  decompress and copy at startup and all the worker processes (and later
+  runs) share the same pages from the OS page cache.
+  For shipping the databases compressed there is a chunked .pdbz file.
+  Every block of CHUNK entries is zlib compressed on its own so the
+  blocks can be decompressed on a thread pool straight into the final
+  (shared) buffer. The .pdbz files are written by streaming through the
+  original npz file so the full database is never held in memory.
+  The corner and 12p7 edge databases can also be written in a grouped
+  index layout. The standard index puts the lehmer digits of the first
+  positions in the high part of the index. The U face turns only change
+  the last positions of the code, so moving their digits (and
+  orientations) to the low part of the index keeps the children of a node
+  from the U face moves within the same page of the database. The other
+  faces scatter as before. See grouped_index below.
+  For hosts that cannot hold the databases at all, the chunked file can be
+  written with small blocks of BLOCK_CHUNK entries (the blocks option).
+  Those stay compressed in memory and BlockCacheDB in
+  rubik_cython_roll_buffdq_solve_MP.pyx decompresses the blocks the search
+  needs into a fixed size LRU cache.
+python rubik_pattern_db.py [int16|nibble|mod3] [raw|chunked|blocks] [grouped]
+"""
+import os
+import sys
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Storage format of a pattern database. These integers are passed to
+#  DFS_cython_solve in rubik_cython_roll_buffdq_solve_MP.pyx so they
+#  need to stay in sync with the values defined there
+DB_INT16 = 0 # one np.int16 per entry (the original format)
+DB_NIBBLE = 1 # two entries per byte. Even index in the low 4 bits
+DB_MOD3 = 2 # distance mod 3 in 2 bits, four entries per byte
+DB_NONE = 3 # not loaded, the search uses 0 for its heuristic
+db_format_names = {DB_INT16:'int16', DB_NIBBLE:'nibble', DB_MOD3:'mod3', \
+                   DB_NONE:'none'}
+
+# The four pattern databases in the order DFS_cython_solve expects them
+db_names = ['corner', 'alledge', 'edge1', 'edge2']
+# The original downloaded databases. The symmetry reduced corner
+#  database is made from the corner one by rubik_cube_symmetry.py
+db_npz_files = {'corner':'rubik_corner_db.npz',\
+                'alledge':'rubik_alledge_db.npz',\
+                'edge1':'rubik_edge1_DFS_12p7_db.npz',\
+                'edge2':'rubik_edge2_DFS_12p7_db.npz',\
+                'cornersym':'rubik_cornersym_db.npz'}
+# Number of entries in each database
+db_sizes = {'corner':88179840, 'alledge':479001600,\
+            'edge1':510935040, 'edge2':510935040, 'cornersym':2152008}
+# Which lehmer code from lehmer_code_faces indexes each database
+#  These need to stay in sync with rubik_cython_roll_buffdq_solve_MP.pyx
+CODE_CORNER = 0
+CODE_ALLEDGE = 1
+CODE_EDGE1 = 2
+CODE_EDGE2 = 3
+CODE_CORNER_SYM = 4
+# edge1 database looked up with the cube conjugated by a symmetry
+#  see rubik_cube_symmetry.edge1_image_symmetry
+CODE_EDGE1_SYM = 5
+# database of any other set of cubies ranked by its spec (see
+#  rubik_cube_fast_dbgen.py and load_npz_spec)
+CODE_SPEC = 6
+db_codes = {'corner':CODE_CORNER, 'alledge':CODE_ALLEDGE, 'edge1':CODE_EDGE1,\
+            'edge2':CODE_EDGE2, 'cornersym':CODE_CORNER_SYM}
+# Only consistent databases can be stored mod 3.
+#  The corner and alledge databases record where all the corners or all
+#  the edges are, so a move on the cube is a move in the database and the
+#  distances of neighbors differ by at most 1.
+#  The edge1 and edge2 databases record which of the 7 edge cubies are in
+#  a fixed set of 7 positions. A move brings in cubies from positions that
+#  are not tracked so neighbors can differ by more than 1. They have to
+#  stay in the nibble or int16 format.
+#  The symmetry reduced corner database gives the same distances as the
+#  corner one so it is consistent as well
+db_consistent = {'corner':True, 'alledge':True, 'edge1':False, 'edge2':False,\
+                 'cornersym':True}
+
+# Index layout of a pattern database. These are passed to DFS_cython_solve
+#  as well and need to stay in sync with rubik_cython_roll_buffdq_solve_MP.pyx
+LAYOUT_STD = 0 # index is the lehmer code
+LAYOUT_GROUPED = 1 # index is grouped_index of the lehmer code
+db_layout_names = {LAYOUT_STD:'std', LAYOUT_GROUPED:'grouped'}
+# The lehmer codes grouped_index changes. The alledge code already has
+#  the U face edges as its last digits and the symmetry reduced corner
+#  code starts with the class so those databases are the same in both layouts
+grouped_codes = (CODE_CORNER, CODE_EDGE1, CODE_EDGE2, CODE_EDGE1_SYM)
+
+# The raw .bin files start with a header of RAW_HEADER bytes. The data
+#  follows so it starts on a page boundary
+RAW_HEADER = 4096
+RAW_MAGIC = b'RUBIKPDB'
+RAW_VERSION = 1
+# The chunked .pdbz files have the same size header with its own magic
+#  then a table of nblocks+1 int64 file offsets of the compressed blocks
+CHUNKED_MAGIC = b'RUBIKPDZ'
+CHUNKED_VERSION = 1
+
+# Work through the large databases in chunks of this many entries
+#  to keep the temporary arrays small
+CHUNK = 1 << 24
+# Entries per block of the chunked files that are kept compressed in
+#  memory. Small so a cache miss only decompresses about a page
+#  (4KB for nibble)
+BLOCK_CHUNK = 1 << 13
+
+# Index in the LAYOUT_GROUPED database for lehmer code idx
+#  corner: perm*2187 + orient with 8 lehmer digits and 7 ternary orient
+#  digits. The last 4 perm digits (24 values) and last 3 orient digits
+#  (27 values) are the U face corners. They go in the low part
+#    ((perm//24)*81 + orient//27)*648 + (perm%24)*27 + orient%27
+#  12p7 edges: rank*128 + orient with 7 digits in radix 12..6 and 7
+#  orientation bits. The last 3 digits (336 values) and 3 orientation bits
+#  are the U face edges
+#    ((rank//336)*16 + orient//8)*2688 + (rank%336)*8 + orient%8
+#  Same as pdb_grouped_index in rubik_cython_roll_buffdq_solve_MP.pyx
+def grouped_index(idx, code):
+    idx = np.asarray(idx, dtype=np.int64)
+    if code == CODE_CORNER:
+        hi, lo = np.divmod(idx, 2187)
+        return ((hi // 24) * 81 + lo // 27) * 648 + (hi % 24) * 27 + lo % 27
+    if code in grouped_codes:
+        hi, lo = np.divmod(idx, 128)
+        return ((hi // 336) * 16 + lo // 8) * 2688 + (hi % 336) * 8 + lo % 8
+    return idx
+
+# Reorder a database from the standard layout to LAYOUT_GROUPED
+#  db is the unpacked database (one distance per entry)
+def to_grouped_layout(db, code):
+    out = np.empty_like(db)
+    for i in range(0, len(db), CHUNK):
+        cur = db[i:i+CHUNK]
+        out[grouped_index(np.arange(i, i+len(cur)), code)] = cur
+    return out
+
+# Load one of the original npz databases
+#  The db generators mark the solved state with -1, fix it to 0 here
+def load_npz_db(filename):
+    with np.load(filename) as data:
+        db = data['db']
+    # Fix -1 score for solved state
+    idx = np.argmin(db)
+    db[idx] = 0
+    return db
+
+# npz file of a database made by rubik_cube_fast_dbgen.py. The
+#  solver databases keep the downloaded names
+def spec_npz_file(name):
+    return db_npz_files.get(name, 'rubik_{0}_db.npz'.format(name))
+
+# The spec saved next to the table of a database made by
+#  rubik_cube_fast_dbgen.py. Pass it to DFS_cython_solve with CODE_SPEC
+def load_npz_spec(filename):
+    with np.load(filename) as data:
+        if 'corner_faces' not in data:
+            raise ValueError('{0} has no spec saved with it'.format(filename))
+        spec = {'corner_faces':data['corner_faces'].tolist(), \
+                'corner_nori':int(data['corner_nori']), \
+                'edge_faces':data['edge_faces'].tolist(), \
+                'edge_nori':int(data['edge_nori'])}
+    return spec
+
+# Return the number of bytes needed to store n entries in format fmt
+def packed_nbytes(n, fmt):
+    if fmt == DB_NONE:
+        return 0
+    if fmt == DB_NIBBLE:
+        return (n + 1) // 2
+    if fmt == DB_MOD3:
+        return (n + 3) // 4
+    return n * 2
+
+# Pack the distances in db two per byte
+# INPUT
+# db - array of distances all >= 0 and < 16
+# out (optional) - uint8 buffer to fill. Lets the caller pack straight into
+#    shared memory
+# OUTPUT - uint8 array of length (len(db)+1)//2
+def pack_nibbles(db, out=None):
+    n = len(db)
+    if out is None:
+        out = np.zeros((packed_nbytes(n, DB_NIBBLE),), dtype=np.uint8)
+    for i in range(0, n, CHUNK):
+        # CHUNK is even so each chunk starts at an even entry
+        cur = db[i:i+CHUNK]
+        if cur.min() < 0 or cur.max() > 15:
+            raise ValueError('Pattern database values must be in 0-15 to pack in 4 bits')
+        cur = cur.astype(np.uint8)
+        if len(cur) % 2 == 1:
+            cur = np.append(cur, np.uint8(0))
+        out[i//2:(i+len(cur))//2] = cur[0::2] | (cur[1::2] << 4)
+    return out
+
+# Undo pack_nibbles. n is the number of entries in the original database
+def unpack_nibbles(packed, n):
+    db = np.zeros((n,), dtype=np.int16)
+    db[0::2] = packed[0:(n+1)//2] & 15
+    db[1::2] = packed[0:n//2] >> 4
+    return db
+
+# Pack the distances in db mod 3 four per byte
+#  Entry i is in bits 2*(i%4) and 2*(i%4)+1 of byte i//4
+# INPUT
+# db - array of distances all >= 0. The database must be consistent
+# out (optional) - uint8 buffer to fill
+# OUTPUT - uint8 array of length (len(db)+3)//4
+def pack_mod3(db, out=None):
+    n = len(db)
+    if out is None:
+        out = np.zeros((packed_nbytes(n, DB_MOD3),), dtype=np.uint8)
+    for i in range(0, n, CHUNK):
+        # CHUNK is a multiple of 4 so each chunk starts a new byte
+        cur = db[i:i+CHUNK]
+        if cur.min() < 0:
+            raise ValueError('Pattern database values must be >= 0 to pack mod 3')
+        cur = np.mod(cur, 3).astype(np.uint8)
+        if len(cur) % 4 != 0:
+            cur = np.append(cur, np.zeros((4 - len(cur) % 4,), dtype=np.uint8))
+        out[i//4:(i+len(cur))//4] = cur[0::4] | (cur[1::4] << 2) | \
+                                    (cur[2::4] << 4) | (cur[3::4] << 6)
+    return out
+
+# Return the distance for a single entry or an array of entries
+#  for a database stored in format fmt
+#  For DB_MOD3 this is only the distance mod 3
+def db_value(db, idx, fmt):
+    if fmt == DB_NIBBLE:
+        idx = np.asarray(idx)
+        return (db[idx >> 1] >> ((idx & 1) << 2)) & 15
+    if fmt == DB_MOD3:
+        idx = np.asarray(idx)
+        return (db[idx >> 2] >> ((idx & 3) << 1)) & 3
+    return db[idx]
+
+# Save a packed database
+#  n is stored alongside the data since the packed length alone
+#  does not say how many entries are in the last byte.
+#  maxval is the largest distance in the database. The mod 3 search needs it
+#  for configurations beyond the depth the database generator searched
+#  layout is LAYOUT_STD or LAYOUT_GROUPED
+def save_packed_db(outfile, packed, n, fmt, maxval, layout=LAYOUT_STD):
+    np.savez_compressed(outfile, db=packed, n=n, fmt=fmt, maxval=maxval, \
+                        layout=layout)
+
+# Load a packed database
+# OUTPUT packed array, number of entries, storage format, max distance,
+#  index layout
+def load_packed_db(filename):
+    with np.load(filename) as data:
+        packed = data['db']
+        n = int(data['n'])
+        fmt = int(data['fmt'])
+        maxval = int(data['maxval']) if 'maxval' in data.files else -1
+        layout = int(data['layout']) if 'layout' in data.files else LAYOUT_STD
+    return packed, n, fmt, maxval, layout
+
+# Save a database uncompressed to a raw file for memory mapping
+#  The header is the magic string followed by int64 version, fmt, n, maxval,
+#  layout. Files from before the layout was added have 0 (LAYOUT_STD) there
+# INPUT
+# outfile - raw file name
+# data - the database in its storage format (uint8 packed or int16)
+# n, fmt, maxval, layout - same as save_packed_db
+def save_raw_db(outfile, data, n, fmt, maxval, layout=LAYOUT_STD):
+    header = np.zeros((RAW_HEADER,), dtype=np.uint8)
+    header[0:len(RAW_MAGIC)] = np.frombuffer(RAW_MAGIC, dtype=np.uint8)
+    info = np.array([RAW_VERSION, fmt, n, maxval, layout], dtype=np.int64)
+    header[len(RAW_MAGIC):len(RAW_MAGIC)+info.nbytes] = info.view(np.uint8)
+    data = np.ascontiguousarray(data)
+    if fmt == DB_INT16:
+        data = data.astype(np.int16, copy=False)
+    with open(outfile, 'wb') as fp:
+        fp.write(header.tobytes())
+        fp.write(memoryview(data).cast('B'))
+
+# Memory map a raw database file read only
+# OUTPUT uint8 memmap of the data bytes, number of entries, storage format,
+#  max distance, index layout. The memmap can be handed straight to
+#  DFS_cython_solve
+def map_raw_db(filename):
+    header = np.fromfile(filename, dtype=np.uint8, count=RAW_HEADER)
+    if not header[0:len(RAW_MAGIC)].tobytes() == RAW_MAGIC:
+        raise ValueError('{0} is not a raw pattern database file'.format(filename))
+    version, fmt, n, maxval, layout = [int(x) for x in \
+            header[len(RAW_MAGIC):len(RAW_MAGIC)+40].view(np.int64)]
+    if not version == RAW_VERSION:
+        raise ValueError('{0} has unsupported version {1:d}'.format(filename, version))
+    data = np.memmap(filename, dtype=np.uint8, mode='r', offset=RAW_HEADER, \
+                     shape=(packed_nbytes(n, fmt),))
+    return data, n, fmt, maxval, layout
+
+# Read the original npz database a chunk of entries at a time
+#  without decompressing the whole array into memory
+#  The -1 marking the solved state is fixed to 0 as in load_npz_db
+# OUTPUT generator of (total number of entries, chunk array)
+def iter_npz_chunks(filename, chunk=CHUNK):
+    with zipfile.ZipFile(filename) as zf:
+        with zf.open('db.npy') as fp:
+            version = np.lib.format.read_magic(fp)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(fp)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(fp)
+            n = shape[0]
+            for i in range(0, n, chunk):
+                ncur = min(chunk, n - i)
+                cur = np.frombuffer(fp.read(ncur * dtype.itemsize), dtype=dtype)
+                cur = np.where(cur < 0, 0, cur).astype(np.int16)
+                yield n, cur
+
+# Stream an original npz database into a chunked .pdbz file
+# INPUT
+# infile - original npz database
+# outfile - chunked file name
+# fmt - storage format of the entries
+# level - zlib compression level
+# layout, code - index layout to write and the lehmer code of the
+#    database. The grouped layout mixes entries from all over the
+#    database into each block so it has to load the whole database
+# chunk - entries per block. A multiple of 4 so each block starts a byte
+def save_chunked_db(infile, outfile, fmt, level=6, layout=LAYOUT_STD, code=None, \
+                    chunk=CHUNK):
+    if layout == LAYOUT_GROUPED:
+        db = to_grouped_layout(load_npz_db(infile), code)
+        chunks = ((len(db), db[i:i+chunk].astype(np.int16)) \
+                  for i in range(0, len(db), chunk))
+    else:
+        chunks = iter_npz_chunks(infile, chunk)
+    return write_chunked_db(outfile, chunks, fmt, level, layout, chunk)
+
+# Write a chunked .pdbz file one block at a time
+# INPUT
+# outfile - chunked file name
+# chunks - iterable of (total number of entries, array of the next chunk
+#    entries). Every chunk but the last has chunk entries
+# fmt, level, layout, chunk - as for save_chunked_db
+# OUTPUT number of entries, max distance
+def write_chunked_db(outfile, chunks, fmt, level=6, layout=LAYOUT_STD, chunk=CHUNK):
+    header = np.zeros((RAW_HEADER,), dtype=np.uint8)
+    offsets = []
+    maxval = 0
+    n = 0
+    with open(outfile, 'wb') as fp:
+        # header and block table are filled in at the end
+        fp.write(header.tobytes())
+        for n, cur in chunks:
+            if len(offsets) == 0:
+                nblocks = (n + chunk - 1) // chunk
+                fp.write(np.zeros((nblocks+1,), dtype=np.int64).tobytes())
+            maxval = max(maxval, int(cur.max()))
+            if fmt == DB_MOD3:
+                packed = pack_mod3(cur)
+            elif fmt == DB_NIBBLE:
+                packed = pack_nibbles(cur)
+            else:
+                packed = cur
+            offsets.append(fp.tell())
+            fp.write(zlib.compress(memoryview(packed).cast('B'), level))
+        offsets.append(fp.tell())
+        header[0:len(CHUNKED_MAGIC)] = np.frombuffer(CHUNKED_MAGIC, dtype=np.uint8)
+        info = np.array([CHUNKED_VERSION, fmt, n, maxval, chunk, len(offsets)-1, \
+                         layout], dtype=np.int64)
+        header[len(CHUNKED_MAGIC):len(CHUNKED_MAGIC)+info.nbytes] = info.view(np.uint8)
+        fp.seek(0)
+        fp.write(header.tobytes())
+        fp.write(np.array(offsets, dtype=np.int64).tobytes())
+    return n, maxval
+
+# Read the header of a chunked .pdbz database
+# OUTPUT storage format, number of entries, max distance, entries per
+#  block, number of blocks, index layout
+def chunked_db_info(filename):
+    header = np.fromfile(filename, dtype=np.uint8, count=RAW_HEADER)
+    if not header[0:len(CHUNKED_MAGIC)].tobytes() == CHUNKED_MAGIC:
+        raise ValueError('{0} is not a chunked pattern database file'.format(filename))
+    version, fmt, n, maxval, chunk, nblocks, layout = [int(x) for x in \
+            header[len(CHUNKED_MAGIC):len(CHUNKED_MAGIC)+56].view(np.int64)]
+    if not version == CHUNKED_VERSION:
+        raise ValueError('{0} has unsupported version {1:d}'.format(filename, version))
+    return fmt, n, maxval, chunk, nblocks, layout
+
+# Load a chunked .pdbz database decompressing the blocks in parallel
+# INPUT
+# filename - chunked file name
+# out (optional) - uint8 buffer of packed_nbytes(n, fmt) bytes to
+#    decompress into. Lets the caller fill shared memory directly
+# nthreads (optional) - threads to use, default is one per cpu.
+#    zlib releases the GIL while it decompresses so threads are enough
+# OUTPUT uint8 array of the data, number of entries, storage format,
+#  max distance, index layout
+def load_chunked_db(filename, out=None, nthreads=None):
+    fmt, n, maxval, chunk, nblocks, layout = chunked_db_info(filename)
+    offsets = np.fromfile(filename, dtype=np.int64, count=nblocks+1, offset=RAW_HEADER)
+    if chunk < 1 or not nblocks == (n + chunk - 1) // chunk:
+        raise ValueError('{0} does not have a block for every chunk'.format(filename))
+    if out is None:
+        out = np.zeros((packed_nbytes(n, fmt),), dtype=np.uint8)
+    if len(out) < packed_nbytes(n, fmt):
+        raise ValueError('Buffer for {0} is too small'.format(filename))
+    blockbytes = packed_nbytes(chunk, fmt)
+    fd = os.open(filename, os.O_RDONLY)
+    # Each thread reads and decompresses its own block into its own slice
+    #  of out so no locking is needed. A block that is missing or short
+    #  would leave zeros that the search takes as distances
+    def do_block(i):
+        comp = os.pread(fd, int(offsets[i+1] - offsets[i]), int(offsets[i]))
+        try:
+            data = np.frombuffer(zlib.decompress(comp), dtype=np.uint8)
+        except zlib.error:
+            data = None
+        if data is None or not len(data) == packed_nbytes(min(chunk, n - i * chunk), fmt):
+            raise ValueError('Block {0:d} of {1} is corrupt'.format(i, filename))
+        out[i*blockbytes:i*blockbytes+len(data)] = data
+    try:
+        with ThreadPoolExecutor(max_workers=nthreads) as pool:
+            list(pool.map(do_block, range(nblocks)))
+    finally:
+        os.close(fd)
+    return out, n, fmt, maxval, layout
+
+# File name suffix for the index layout. Standard layout files keep
+#  their original names
+def layout_suffix(layout):
+    return '' if layout == LAYOUT_STD else '_' + db_layout_names[layout]
+
+# Read the compressed blocks of a chunked .pdbz database without
+#  decompressing them. For BlockCacheDB in rubik_cython_roll_buffdq_solve_MP.pyx
+# INPUT
+# filename - chunked file name
+# out (optional) - uint8 buffer of compressed_nbytes(filename) bytes to
+#    read into
+# OUTPUT uint8 array of the compressed blocks, int64 offsets of the blocks
+#  in it (nblocks+1), number of entries, storage format, max distance,
+#  entries per block, index layout
+def load_compressed_blocks(filename, out=None):
+    fmt, n, maxval, chunk, nblocks, layout = chunked_db_info(filename)
+    offsets = np.fromfile(filename, dtype=np.int64, count=nblocks+1, offset=RAW_HEADER)
+    if out is None:
+        out = np.zeros((offsets[-1] - offsets[0],), dtype=np.uint8)
+    with open(filename, 'rb') as fp:
+        fp.seek(offsets[0])
+        fp.readinto(memoryview(out).cast('B'))
+    return out, offsets - offsets[0], n, fmt, maxval, chunk, layout
+
+# Bytes of compressed data in a chunked .pdbz database
+def compressed_nbytes(filename):
+    nblocks = chunked_db_info(filename)[4]
+    offsets = np.fromfile(filename, dtype=np.int64, count=nblocks+1, offset=RAW_HEADER)
+    return int(offsets[-1] - offsets[0])
+
+# Name of the packed database file for a database name, format and layout
+def packed_db_file(name, fmt, layout=LAYOUT_STD):
+    return 'rubik_{0}_db_{1}{2}.npz'.format(name, db_format_names[fmt], layout_suffix(layout))
+
+# Name of the raw database file for a database name, format and layout
+def raw_db_file(name, fmt, layout=LAYOUT_STD):
+    return 'rubik_{0}_db_{1}{2}.bin'.format(name, db_format_names[fmt], layout_suffix(layout))
+
+# Name of the chunked database file for a database name, format and layout
+def chunked_db_file(name, fmt, layout=LAYOUT_STD):
+    return 'rubik_{0}_db_{1}{2}.pdbz'.format(name, db_format_names[fmt], layout_suffix(layout))
+
+# Name of the chunked database file with BLOCK_CHUNK blocks
+def blocks_db_file(name, fmt, layout=LAYOUT_STD):
+    return 'rubik_{0}_db_{1}{2}_blocks.pdbz'.format(name, db_format_names[fmt], layout_suffix(layout))
+
+# Name of the file a database is read from
+#  dbfiles is 'npz', 'raw', 'chunked' or 'blocks' as in the DBFILES setting of
+#  rubik_cython_roll_buffdq_solve_MP2.py. The int16 npz database is the
+#  original download (always in the standard layout)
+def db_file(name, fmt, dbfiles, layout=LAYOUT_STD):
+    if dbfiles == 'raw':
+        return raw_db_file(name, fmt, layout)
+    if dbfiles == 'chunked':
+        return chunked_db_file(name, fmt, layout)
+    if dbfiles == 'blocks':
+        return blocks_db_file(name, fmt, layout)
+    if fmt == DB_INT16:
+        return db_npz_files[name]
+    return packed_db_file(name, fmt, layout)
+
+if __name__ == '__main__':
+    # Convert the original downloaded databases to the nibble (default),
+    #  mod3 or int16 format. Add raw to write memory mappable .bin files
+    #  or chunked to write the block compressed .pdbz files or blocks for
+    #  .pdbz files with small blocks to keep compressed in memory. Add
+    #  grouped to write them in the grouped index layout
+    usefmt = DB_NIBBLE
+    if len(sys.argv) > 1 and sys.argv[1] == 'mod3':
+        usefmt = DB_MOD3
+    if len(sys.argv) > 1 and sys.argv[1] == 'int16':
+        usefmt = DB_INT16
+    useraw = 'raw' in sys.argv[1:]
+    usechunked = 'chunked' in sys.argv[1:]
+    useblocks = 'blocks' in sys.argv[1:]
+    uselayout = LAYOUT_GROUPED if 'grouped' in sys.argv[1:] else LAYOUT_STD
+    if usefmt == DB_INT16 and not useraw and not usechunked and not useblocks:
+        print('The int16 format is only written as raw or chunked. The npz originals are already int16')
+        exit()
+    for curname in db_npz_files:
+        if not os.path.exists(db_npz_files[curname]):
+            print('Skipping {0} {1} not found'.format(curname, db_npz_files[curname]))
+            continue
+        if usefmt == DB_MOD3 and not db_consistent[curname]:
+            print('Skipping {0} it is not consistent and cannot be stored mod 3'.format(curname))
+            continue
+        if uselayout == LAYOUT_GROUPED and not db_codes[curname] in grouped_codes:
+            print('Skipping {0} the grouped layout is the same as the standard one'.format(curname))
+            continue
+        print('Packing {0}'.format(db_npz_files[curname]))
+        if usechunked or useblocks:
+            if useblocks:
+                outfile = blocks_db_file(curname, usefmt, uselayout)
+                usechunk = BLOCK_CHUNK
+            else:
+                outfile = chunked_db_file(curname, usefmt, uselayout)
+                usechunk = CHUNK
+            n, maxval = save_chunked_db(db_npz_files[curname], outfile, usefmt, \
+                                        layout=uselayout, code=db_codes[curname], \
+                                        chunk=usechunk)
+            print('Wrote {0} {1:d} entries {2:d} bytes'.format(outfile, n, os.path.getsize(outfile)))
+            continue
+        db = load_npz_db(db_npz_files[curname])
+        if uselayout == LAYOUT_GROUPED:
+            db = to_grouped_layout(db, db_codes[curname])
+        if usefmt == DB_MOD3:
+            packed = pack_mod3(db)
+        elif usefmt == DB_NIBBLE:
+            packed = pack_nibbles(db)
+        else:
+            packed = db.astype(np.int16)
+        if useraw:
+            outfile = raw_db_file(curname, usefmt, uselayout)
+            save_raw_db(outfile, packed, len(db), usefmt, int(db.max()), uselayout)
+        else:
+            outfile = packed_db_file(curname, usefmt, uselayout)
+            save_packed_db(outfile, packed, len(db), usefmt, int(db.max()), uselayout)
+        print('Wrote {0} {1:d} entries {2:d} bytes'.format(outfile, len(db), packed.nbytes))
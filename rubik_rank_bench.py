@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 2026
+
+Microbenchmark of the lehmer ranking paths of
+  rubik_cython_roll_buffdq_solve_MP.pyx (lehmer_rank). The cubies already
+  seen are counted with the edge_bincount table, the popcnt instruction
+  or the BMI2 pext/tzcnt instructions. Each path the cpu supports ranks
+  the same random permutations of the corner (8 of 8), all edge
+  (12 of 12) and 12p7 edge (7 of 12) codes. The ranks per second are
+  printed and the sums of the ranks are checked to agree.
+  The solver uses the path picked when the module loads (pext when the
+  cpu has BMI2, then popcnt). Use set_rank_path() before starting the
+  workers to use another one.
+python rubik_rank_bench.py [nrows] [repeats]
+"""
+import sys
+from timeit import default_timer as timer
+import numpy as np
+import rubik_cython_roll_buffdq_solve_MP as rcmMP
+
+# Random rows of nslot distinct cubies out of ncubie
+def random_cubies(nrows, nslot, ncubie, seed=0):
+    rng = np.random.default_rng(seed)
+    perms = np.argsort(rng.random((nrows, ncubie)), axis=1)
+    return perms[:, 0:nslot].astype(np.uint8)
+
+if __name__ == '__main__':
+    # The rows fit in cache so this times the ranking only
+    nrows = 4096
+    repeats = 2000
+    if len(sys.argv) > 1:
+        nrows = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        repeats = int(sys.argv[2])
+    paths, curpath = rcmMP.rank_paths()
+    print('Ranking paths on this cpu: {0} (using {1})'.format( \
+          ' '.join([rcmMP.RANK_PATH_NAMES[x] for x in paths]), rcmMP.RANK_PATH_NAMES[curpath]))
+    for curname, nslot, ncubie in [('corner', 8, 8), ('alledge', 12, 12), ('12p7 edge', 7, 12)]:
+        cubies = random_cubies(nrows, nslot, ncubie)
+        sums = []
+        for path in paths:
+            # Warm up
+            rcmMP.bench_rank(path, cubies, ncubie, 1)
+            startts = timer()
+            nrank, total = rcmMP.bench_rank(path, cubies, ncubie, repeats)
+            elapsed = timer() - startts
+            sums.append(total)
+            print('{0} {1} {2:.1f} M ranks/s'.format(curname, rcmMP.RANK_PATH_NAMES[path], \
+                  nrank / elapsed / 1.0e6))
+        if not len(set(sums)) == 1:
+            print('{0} ranks differ between the paths'.format(curname))
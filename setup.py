@@ -36,6 +36,12 @@ extensions = [
                 "rubik_cython_roll_buffdq_solve_MP",
                 ["rubik_cython_roll_buffdq_solve_MP.pyx"],
                 include_dirs=[numpy.get_include()],
+                libraries=["z"],
+                extra_compile_args = ["-O3"]
+        ),
+        Extension(
+                "rubik_cython_dbgen",
+                ["rubik_cython_dbgen.pyx"],
                 extra_compile_args = ["-O3"]
         )
 ]